@@ -0,0 +1,64 @@
+"""
+Add the indexes used by the portal layer JSON exporter (json_generator/layer_export.py).
+
+Every exporter query is portal-scoped: PortalLayers and PortalSwitchLayers
+are filtered by PortalId, switch children by PortalSwitchLayerId, and fields,
+styles and ORDERBY rows are fetched per ServiceLayerId / MapServerLayerId in
+display order. None of these tables had a secondary index, so each lookup was
+a full scan plus a temp B-tree sort.
+
+Safe to re-run — CREATE INDEX IF NOT EXISTS.
+"""
+
+import sqlite3
+import os
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "MapMakerDB.db")
+
+INDEXES = [
+    ("ix_PortalLayers_Portal_ServiceLayer",
+     "PortalLayers (PortalId, ServiceLayerId)"),
+    ("ix_PortalSwitchLayers_Portal",
+     "PortalSwitchLayers (PortalId)"),
+    ("ix_PortalSwitchLayerChildren_Switch_Order",
+     "PortalSwitchLayerChildren (PortalSwitchLayerId, ChildOrder, ServiceLayerId)"),
+    ("ix_ServiceLayers_MapServerLayer",
+     "ServiceLayers (MapServerLayerId)"),
+    ("ix_ServiceLayerFields_ServiceLayer_Order",
+     "ServiceLayerFields (ServiceLayerId, FieldOrder, FieldName)"),
+    ("ix_MapServerLayerStyles_MapServerLayer_Order",
+     "MapServerLayerStyles (MapServerLayerId, DisplayOrder)"),
+    ("ix_ServiceLayerOrderBy_ServiceLayer_Position",
+     "ServiceLayerOrderBy (ServiceLayerId, SortPosition)"),
+]
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    created = []
+    for name, target in INDEXES:
+        cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+            (name,),
+        )
+        if cur.fetchone():
+            print(f"{name} already exists (skipped)")
+            continue
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+        created.append(name)
+        print(f"Created {name}.")
+
+    if not created:
+        print("All exporter indexes already exist — nothing to do.")
+        conn.close()
+        return
+
+    cur.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Add a (PortalId, ParentNodeId, DisplayOrder) index to PortalTreeNodes.
+
+Every tree read and write is scoped by portal and parent: get_portal_tree
+loads a portal ordered by parent/DisplayOrder, sibling renumbering and
+move/insert paths select WHERE PortalId = ? AND ParentNodeId = ? ORDER BY
+DisplayOrder. Without an index each of these is a full table scan plus a
+temp B-tree sort.
+
+Safe to re-run — CREATE INDEX IF NOT EXISTS.
+"""
+
+import sqlite3
+import os
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "MapMakerDB.db")
+
+INDEX_NAME = "ix_PortalTreeNodes_Portal_Parent_Order"
+
+
+def main():
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+        (INDEX_NAME,),
+    )
+    if cur.fetchone():
+        print(f"{INDEX_NAME} already exists — nothing to do.")
+        conn.close()
+        return
+
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {INDEX_NAME}
+        ON PortalTreeNodes (PortalId, ParentNodeId, DisplayOrder)
+    """)
+    cur.execute("ANALYZE PortalTreeNodes")
+    conn.commit()
+    conn.close()
+    print(f"Created {INDEX_NAME}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ creating a single unified database.
 Linking key:
     MapMakerDB.Layers.Name  ==  LayerConfig.MapServerLayers.MapLayerName
 
-Safe to run multiple times (idempotent).
+Safe to run multiple times (idempotent). Steps 2-12 run in a single
+transaction, so a failed run leaves MapMakerDB as it was.
 Run from the project root:
     python Database/migrate_to_unified.py
 """
@@ -27,6 +28,23 @@ MM_BAK = SCRIPT_DIR / "MapMakerDB_pre_migration.db"
 LC_BAK = REPO_ROOT / "json_generator" / "LayerConfig_v4_pre_migration.db"
 
 
+_SQL_INSERT_PORTAL_TREE_NODES = """
+    INSERT INTO main.PortalTreeNodes
+        (PortalTreeNodeId, PortalId, ParentNodeId, IsFolder,
+         FolderTitle, LayerKey, DisplayOrder, Glyph,
+         CheckedDefault, ExpandedDefault, Tooltip, FolderId, LayerTitle)
+    SELECT
+        src.PortalTreeNodeId, src.PortalId, src.ParentNodeId, src.IsFolder,
+        src.FolderTitle, src.LayerKey, src.DisplayOrder, src.Glyph,
+        src.CheckedDefault, src.ExpandedDefault, src.Tooltip, src.FolderId,
+        src.LayerTitle
+    FROM lc.PortalTreeNodes src
+    WHERE src.PortalTreeNodeId NOT IN (
+        SELECT PortalTreeNodeId FROM main.PortalTreeNodes
+    )
+"""
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -77,7 +95,6 @@ def step2_extend_portals(mm, lc):
             "UPDATE Portals SET TreeTitle = ? WHERE PortalId = ?",
             (row["TreeTitle"], row["PortalId"]),
         )
-    mm.commit()
     print("  TreeTitle values populated")
 
 
@@ -117,26 +134,26 @@ def step3_import_mapserver_layers(mm, lc):
             "SELECT MapServerLayerId FROM MapServerLayers"
         ).fetchall()
     }
-    rows = lc.execute("SELECT * FROM MapServerLayers").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["MapServerLayerId"] not in existing_ids:
-            mm_cur.execute("""
-                INSERT INTO MapServerLayers
-                    (MapServerLayerId, MapLayerName, BaseLayerKey, GridXType,
-                     GeometryType, DefaultGeomFieldName, LabelClassName,
-                     GeomFieldName, Opacity, Projection, NoCluster, IsXYZ,
-                     IsArcGisRest, MaxScale)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                row["MapServerLayerId"], row["MapLayerName"], row["BaseLayerKey"],
-                row["GridXType"], row["GeometryType"], row["DefaultGeomFieldName"],
-                row["LabelClassName"], row["GeomFieldName"], row["Opacity"],
-                row["Projection"], row["NoCluster"], row["IsXYZ"],
-                row["IsArcGisRest"], row["MaxScale"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM MapServerLayers")
+    mm_cur.executemany("""
+        INSERT INTO MapServerLayers
+            (MapServerLayerId, MapLayerName, BaseLayerKey, GridXType,
+             GeometryType, DefaultGeomFieldName, LabelClassName,
+             GeomFieldName, Opacity, Projection, NoCluster, IsXYZ,
+             IsArcGisRest, MaxScale)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, (
+        (
+            row["MapServerLayerId"], row["MapLayerName"], row["BaseLayerKey"],
+            row["GridXType"], row["GeometryType"], row["DefaultGeomFieldName"],
+            row["LabelClassName"], row["GeomFieldName"], row["Opacity"],
+            row["Projection"], row["NoCluster"], row["IsXYZ"],
+            row["IsArcGisRest"], row["MaxScale"]
+        )
+        for row in rows
+        if row["MapServerLayerId"] not in existing_ids
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing_ids)} already present)")
 
     # Add FK column to Layers
@@ -158,7 +175,6 @@ def step3_import_mapserver_layers(mm, lc):
         )
         WHERE MapServerLayerId IS NULL
     """)
-    mm.commit()
 
     linked = mm_cur.execute(
         "SELECT COUNT(*) FROM Layers WHERE MapServerLayerId IS NOT NULL"
@@ -194,21 +210,22 @@ def step4_import_mapserver_layer_fields(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT FieldId FROM MapServerLayerFields").fetchall()
     }
-    rows = lc.execute("SELECT * FROM MapServerLayerFields").fetchall()
-    inserted = sum(1 for row in rows if row["FieldId"] not in existing)
-    for row in rows:
-        if row["FieldId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO MapServerLayerFields
-                    (FieldId, MapServerLayerId, FieldName, FieldType,
-                     IncludeInPropertyCsv, IsIdProperty, DisplayOrder)
-                VALUES (?,?,?,?,?,?,?)
-            """, (
-                row["FieldId"], row["MapServerLayerId"], row["FieldName"],
-                row["FieldType"], row["IncludeInPropertyCsv"],
-                row["IsIdProperty"], row["DisplayOrder"],
-            ))
-    mm.commit()
+    rows = lc.execute("SELECT * FROM MapServerLayerFields")
+    mm_cur.executemany("""
+        INSERT INTO MapServerLayerFields
+            (FieldId, MapServerLayerId, FieldName, FieldType,
+             IncludeInPropertyCsv, IsIdProperty, DisplayOrder)
+        VALUES (?,?,?,?,?,?,?)
+    """, (
+        (
+            row["FieldId"], row["MapServerLayerId"], row["FieldName"],
+            row["FieldType"], row["IncludeInPropertyCsv"],
+            row["IsIdProperty"], row["DisplayOrder"]
+        )
+        for row in rows
+        if row["FieldId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -235,21 +252,21 @@ def step5_import_mapserver_layer_styles(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT StyleId FROM MapServerLayerStyles").fetchall()
     }
-    rows = lc.execute("SELECT * FROM MapServerLayerStyles").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["StyleId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO MapServerLayerStyles
-                    (StyleId, MapServerLayerId, GroupName, StyleTitle,
-                     DisplayOrder, IsIncluded)
-                VALUES (?,?,?,?,?,?)
-            """, (
-                row["StyleId"], row["MapServerLayerId"], row["GroupName"],
-                row["StyleTitle"], row["DisplayOrder"], row["IsIncluded"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM MapServerLayerStyles")
+    mm_cur.executemany("""
+        INSERT INTO MapServerLayerStyles
+            (StyleId, MapServerLayerId, GroupName, StyleTitle,
+             DisplayOrder, IsIncluded)
+        VALUES (?,?,?,?,?,?)
+    """, (
+        (
+            row["StyleId"], row["MapServerLayerId"], row["GroupName"],
+            row["StyleTitle"], row["DisplayOrder"], row["IsIncluded"]
+        )
+        for row in rows
+        if row["StyleId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -281,24 +298,24 @@ def step6_import_service_layers(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT ServiceLayerId FROM ServiceLayers").fetchall()
     }
-    rows = lc.execute("SELECT * FROM ServiceLayers").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["ServiceLayerId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO ServiceLayers
-                    (ServiceLayerId, MapServerLayerId, ServiceType, LayerKey,
-                     FeatureType, IdPropertyName, GeomFieldName, GridXType,
-                     Grouping, IsUserConfigurable, WfsMaxScale)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                row["ServiceLayerId"], row["MapServerLayerId"], row["ServiceType"],
-                row["LayerKey"], row["FeatureType"], row["IdPropertyName"],
-                row["GeomFieldName"], row["GridXType"], row["Grouping"],
-                row["IsUserConfigurable"], row["WfsMaxScale"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM ServiceLayers")
+    mm_cur.executemany("""
+        INSERT INTO ServiceLayers
+            (ServiceLayerId, MapServerLayerId, ServiceType, LayerKey,
+             FeatureType, IdPropertyName, GeomFieldName, GridXType,
+             Grouping, IsUserConfigurable, WfsMaxScale)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?)
+    """, (
+        (
+            row["ServiceLayerId"], row["MapServerLayerId"], row["ServiceType"],
+            row["LayerKey"], row["FeatureType"], row["IdPropertyName"],
+            row["GeomFieldName"], row["GridXType"], row["Grouping"],
+            row["IsUserConfigurable"], row["WfsMaxScale"]
+        )
+        for row in rows
+        if row["ServiceLayerId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -327,22 +344,22 @@ def step7_import_service_layer_fields(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT FieldId FROM ServiceLayerFields").fetchall()
     }
-    rows = lc.execute("SELECT * FROM ServiceLayerFields").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["FieldId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO ServiceLayerFields
-                    (FieldId, ServiceLayerId, FieldName, FieldType,
-                     IncludeInPropertyname, IsTooltip, TooltipAlias, FieldOrder)
-                VALUES (?,?,?,?,?,?,?,?)
-            """, (
-                row["FieldId"], row["ServiceLayerId"], row["FieldName"],
-                row["FieldType"], row["IncludeInPropertyname"], row["IsTooltip"],
-                row["TooltipAlias"], row["FieldOrder"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM ServiceLayerFields")
+    mm_cur.executemany("""
+        INSERT INTO ServiceLayerFields
+            (FieldId, ServiceLayerId, FieldName, FieldType,
+             IncludeInPropertyname, IsTooltip, TooltipAlias, FieldOrder)
+        VALUES (?,?,?,?,?,?,?,?)
+    """, (
+        (
+            row["FieldId"], row["ServiceLayerId"], row["FieldName"],
+            row["FieldType"], row["IncludeInPropertyname"], row["IsTooltip"],
+            row["TooltipAlias"], row["FieldOrder"]
+        )
+        for row in rows
+        if row["FieldId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -369,21 +386,21 @@ def step8_import_service_layer_styles(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT StyleId FROM ServiceLayerStyles").fetchall()
     }
-    rows = lc.execute("SELECT * FROM ServiceLayerStyles").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["StyleId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO ServiceLayerStyles
-                    (StyleId, ServiceLayerId, StyleName, StyleTitle,
-                     UseLabelRule, StyleOrder)
-                VALUES (?,?,?,?,?,?)
-            """, (
-                row["StyleId"], row["ServiceLayerId"], row["StyleName"],
-                row["StyleTitle"], row["UseLabelRule"], row["StyleOrder"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM ServiceLayerStyles")
+    mm_cur.executemany("""
+        INSERT INTO ServiceLayerStyles
+            (StyleId, ServiceLayerId, StyleName, StyleTitle,
+             UseLabelRule, StyleOrder)
+        VALUES (?,?,?,?,?,?)
+    """, (
+        (
+            row["StyleId"], row["ServiceLayerId"], row["StyleName"],
+            row["StyleTitle"], row["UseLabelRule"], row["StyleOrder"]
+        )
+        for row in rows
+        if row["StyleId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -408,16 +425,16 @@ def step9_import_portal_layers(mm, lc):
     existing = {
         r[0] for r in mm_cur.execute("SELECT PortalLayerId FROM PortalLayers").fetchall()
     }
-    rows = lc.execute("SELECT * FROM PortalLayers").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["PortalLayerId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO PortalLayers (PortalLayerId, PortalId, ServiceLayerId)
-                VALUES (?,?,?)
-            """, (row["PortalLayerId"], row["PortalId"], row["ServiceLayerId"]))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM PortalLayers")
+    mm_cur.executemany("""
+        INSERT INTO PortalLayers (PortalLayerId, PortalId, ServiceLayerId)
+        VALUES (?,?,?)
+    """, (
+        (row["PortalLayerId"], row["PortalId"], row["ServiceLayerId"])
+        for row in rows
+        if row["PortalLayerId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -444,20 +461,20 @@ def step10_import_portal_switch_layers(mm, lc):
             "SELECT PortalSwitchLayerId FROM PortalSwitchLayers"
         ).fetchall()
     }
-    rows = lc.execute("SELECT * FROM PortalSwitchLayers").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["PortalSwitchLayerId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO PortalSwitchLayers
-                    (PortalSwitchLayerId, PortalId, SwitchKey, VectorFeaturesMinScale)
-                VALUES (?,?,?,?)
-            """, (
-                row["PortalSwitchLayerId"], row["PortalId"],
-                row["SwitchKey"], row["VectorFeaturesMinScale"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM PortalSwitchLayers")
+    mm_cur.executemany("""
+        INSERT INTO PortalSwitchLayers
+            (PortalSwitchLayerId, PortalId, SwitchKey, VectorFeaturesMinScale)
+        VALUES (?,?,?,?)
+    """, (
+        (
+            row["PortalSwitchLayerId"], row["PortalId"],
+            row["SwitchKey"], row["VectorFeaturesMinScale"]
+        )
+        for row in rows
+        if row["PortalSwitchLayerId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
@@ -485,25 +502,25 @@ def step11_import_portal_switch_layer_children(mm, lc):
             "SELECT PortalSwitchLayerChildId FROM PortalSwitchLayerChildren"
         ).fetchall()
     }
-    rows = lc.execute("SELECT * FROM PortalSwitchLayerChildren").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["PortalSwitchLayerChildId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO PortalSwitchLayerChildren
-                    (PortalSwitchLayerChildId, PortalSwitchLayerId,
-                     ServiceLayerId, ChildOrder)
-                VALUES (?,?,?,?)
-            """, (
-                row["PortalSwitchLayerChildId"], row["PortalSwitchLayerId"],
-                row["ServiceLayerId"], row["ChildOrder"],
-            ))
-            inserted += 1
-    mm.commit()
+    rows = lc.execute("SELECT * FROM PortalSwitchLayerChildren")
+    mm_cur.executemany("""
+        INSERT INTO PortalSwitchLayerChildren
+            (PortalSwitchLayerChildId, PortalSwitchLayerId,
+             ServiceLayerId, ChildOrder)
+        VALUES (?,?,?,?)
+    """, (
+        (
+            row["PortalSwitchLayerChildId"], row["PortalSwitchLayerId"],
+            row["ServiceLayerId"], row["ChildOrder"]
+        )
+        for row in rows
+        if row["PortalSwitchLayerChildId"] not in existing
+    ))
+    inserted = mm_cur.rowcount
     print(f"  Imported {inserted} rows  ({len(existing)} already present)")
 
 
-def step12_import_portal_tree_nodes(mm, lc):
+def step12_import_portal_tree_nodes(mm):
     print("\nStep 12: Importing PortalTreeNodes...")
     mm_cur = mm.cursor()
 
@@ -530,31 +547,12 @@ def step12_import_portal_tree_nodes(mm, lc):
     else:
         print("  PortalTreeNodes already exists (skipped)")
 
-    existing = {
-        r[0] for r in mm_cur.execute(
-            "SELECT PortalTreeNodeId FROM PortalTreeNodes"
-        ).fetchall()
-    }
-    rows = lc.execute("SELECT * FROM PortalTreeNodes").fetchall()
-    inserted = 0
-    for row in rows:
-        if row["PortalTreeNodeId"] not in existing:
-            mm_cur.execute("""
-                INSERT INTO PortalTreeNodes
-                    (PortalTreeNodeId, PortalId, ParentNodeId, IsFolder,
-                     FolderTitle, LayerKey, DisplayOrder, Glyph,
-                     CheckedDefault, ExpandedDefault, Tooltip, FolderId, LayerTitle)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                row["PortalTreeNodeId"], row["PortalId"], row["ParentNodeId"],
-                row["IsFolder"], row["FolderTitle"], row["LayerKey"],
-                row["DisplayOrder"], row["Glyph"], row["CheckedDefault"],
-                row["ExpandedDefault"], row["Tooltip"], row["FolderId"],
-                row["LayerTitle"],
-            ))
-            inserted += 1
-    mm.commit()
-    print(f"  Imported {inserted} rows  ({len(existing)} already present)")
+    # The anti-join against existing node ids runs inside SQLite, reading
+    # LayerConfig through the "lc" schema attached in main().
+    existing = _row_count(mm_cur, "main.PortalTreeNodes")
+    mm_cur.execute(_SQL_INSERT_PORTAL_TREE_NODES)
+    inserted = mm_cur.rowcount
+    print(f"  Imported {inserted} rows  ({existing} already present)")
 
 
 def step13_verify(mm):
@@ -605,10 +603,23 @@ def main():
 
     mm = sqlite3.connect(MM_DB)
     mm.row_factory = sqlite3.Row
+    # Bulk-import tuning. These are per-connection only; journal_mode is left
+    # alone because WAL is persisted in the file header and the DB is checked in.
+    mm.execute("PRAGMA synchronous = NORMAL")
+    mm.execute("PRAGMA temp_store = MEMORY")
+    mm.execute("PRAGMA cache_size = -65536")
+    mm.execute("PRAGMA busy_timeout = 5000")
+    # Manage the transaction explicitly: every step below runs inside one
+    # write transaction, so the import commits (and fsyncs) once, and a
+    # failure part-way through leaves MapMakerDB untouched.
+    mm.isolation_level = None
+    # ATTACH is not allowed inside a transaction, so do it before BEGIN.
+    mm.execute("ATTACH DATABASE ? AS lc", (str(LC_DB),))
     lc = sqlite3.connect(LC_DB)
     lc.row_factory = sqlite3.Row
 
     try:
+        mm.execute("BEGIN IMMEDIATE")
         step2_extend_portals(mm, lc)
         step3_import_mapserver_layers(mm, lc)
         step4_import_mapserver_layer_fields(mm, lc)
@@ -619,9 +630,14 @@ def main():
         step9_import_portal_layers(mm, lc)
         step10_import_portal_switch_layers(mm, lc)
         step11_import_portal_switch_layer_children(mm, lc)
-        step12_import_portal_tree_nodes(mm, lc)
+        step12_import_portal_tree_nodes(mm)
+        mm.execute("COMMIT")
         step13_verify(mm)
         print("\nMigration complete.")
+    except BaseException:
+        if mm.in_transaction:
+            mm.execute("ROLLBACK")
+        raise
     finally:
         mm.close()
         lc.close()
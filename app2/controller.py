@@ -272,6 +272,9 @@ class Controller(QtCore.QObject):
         conn = sqlite3.connect(db_path)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys=ON")
+        # Check FKs once at COMMIT instead of per row; SQLite resets this
+        # after the transaction ends, and violations still abort the commit.
+        conn.execute("PRAGMA defer_foreign_keys=ON")
         try:
             with conn:  # atomic commit/rollback
                 # Call the refactored versions that accept an existing connection
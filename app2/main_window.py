@@ -4,6 +4,7 @@ from PyQt5.QtWidgets import QMessageBox, QFileDialog, QTableWidgetItem, QProgres
 from PyQt5.QtGui import QPalette
 
 import os, json, logging, pprint, traceback, sqlite3, mappyfile
+from collections import namedtuple
 
 #from app2.view import Ui_MainWindow
 from app2 import settings
@@ -20,13 +21,83 @@ from app2.UI.mixin_columns import ColumnsMixin, NULL_VAL_UNSET
 from tabulate import tabulate
 
 from json_generator.db_access import DBAccess
-from json_generator.mapfile_utils import parse_mapfile, extract_styles, extract_fields
+from json_generator.mapfile_utils import parse_mapfile, parse_mapfile_cached, extract_styles, extract_fields
 from json_generator import layer_export
 
 
 logger = logging.getLogger(__name__)
 pp = pprint.PrettyPrinter(indent=4)
 
+# Tab 3 layer icon choices: (friendly label, stored PortalTreeNodes.Glyph).
+# Shared and read-only; see _tab3_icon_catalogue.
+_TAB3_ICON_CATALOGUE = (
+    ("(none)", ""),
+    ("Line Layer", "ea02@font-gis"),
+    ("Point Layer", "ea52@font-gis"),
+    ("Polygon Layer", "ea0a@font-gis"),
+    ("Map1", "ea53@font-gis"),
+    ("Map2", "x-fas fa-map"),
+    ("Horz. Bars", "x-fas fa-bars"),
+    ("Sun", "x-far fa-sun"),
+    ("Wrench", "x-fas fa-wrench"),
+)
+
+# One tblFields row, in column order (see MainWindow._fill_fields_table)
+FieldRow = namedtuple(
+    "FieldRow", "name ftype is_id include is_tooltip tooltip_alias"
+)
+
+# UserRole payload of tblAllLayers rows (see _refresh_all_layers_table).
+# Stored as-is on the item, so no per-row dict conversion through QVariant.
+AllLayersMeta = namedtuple(
+    "AllLayersMeta",
+    "map_layer_id base_key map_name has_wms has_wfs is_xyz portal_usage",
+)
+
+
+def _fields_rows_from_schema(schema):
+    """
+    FieldRows for a WFS {field_name: type} schema: new fields start
+    unchecked with no alias.
+    """
+    return [
+        FieldRow(fname, ftype or "string", False, False, False, "")
+        for fname, ftype in schema.items()
+    ]
+
+
+def _fields_rows_from_db(fields, wfs_by_name, id_prop_name):
+    """
+    FieldRows for a DB layer's MapServerLayerFields.
+
+    Include/tooltip/alias come from the WFS ServiceLayerFields row of the
+    same name when there is one (wfs_by_name), else from IncludeInPropertyCsv
+    with no tooltip. A field is the id property if flagged in the DB or if
+    it matches the WFS IdPropertyName.
+    """
+    rows = []
+    for f in fields:
+        fname = f["FieldName"]
+        sf = wfs_by_name.get(fname)
+        if sf is not None:
+            include = bool(sf["IncludeInPropertyname"])
+            is_tooltip = bool(sf["IsTooltip"])
+            tooltip_alias = sf["TooltipAlias"] or ""
+        else:
+            include = bool(f["IncludeInPropertyCsv"])
+            is_tooltip = False
+            tooltip_alias = ""
+
+        rows.append(FieldRow(
+            fname,
+            f["FieldType"] or "string",
+            bool(f["IsIdProperty"]) or bool(id_prop_name and fname == id_prop_name),
+            include,
+            is_tooltip,
+            tooltip_alias,
+        ))
+    return rows
+
 
 class _PortalTreeDragDropHandler(QObject):
     """
@@ -164,6 +235,37 @@ class _PortalTreeDragDropHandler(QObject):
         return True
 
 
+class _WfsSchemaSignals(QObject):
+    """Signals for _WfsSchemaTask; (request_id, schema) or (request_id, error)."""
+
+    # object, not dict: a dict signal goes through QVariantMap, which
+    # re-sorts the keys and would lose the DescribeFeatureType field order.
+    finished = QtCore.pyqtSignal(int, object)
+    failed = QtCore.pyqtSignal(int, str)
+
+
+class _WfsSchemaTask(QtCore.QRunnable):
+    """
+    Runs a blocking WFS DescribeFeatureType fetch on the global thread pool.
+    The result is delivered through self.signals, which live on the UI
+    thread, so the connected slots run there (queued connection).
+    """
+
+    def __init__(self, request_id, fetch):
+        super().__init__()
+        self.request_id = request_id
+        self._fetch = fetch
+        self.signals = _WfsSchemaSignals()
+
+    def run(self):
+        try:
+            schema = self._fetch()
+        except Exception as exc:
+            self.signals.failed.emit(self.request_id, str(exc))
+        else:
+            self.signals.finished.emit(self.request_id, schema)
+
+
 class MainWindowUIClass(QtWidgets.QMainWindow):
     def __init__(self, controller=None, parent=None):
         super().__init__(parent)
@@ -793,14 +895,41 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
         # Internal caches
         self._portal_id_by_index = []  # index -> PortalId
+        self._portal_key_by_id = {}  # PortalId -> PortalKey
         self._tree_model = None
+        self._tree_nodes_by_id = {}  # PortalTreeNodeId -> row dict of the loaded tree
         self._mapfile_layers = {}  # layer_name -> layer dict
         self._building_tree = False
 
+        # Background WFS schema fetch for btnLoadFieldsFromWFS. Only the
+        # latest request's result is applied; the task is kept referenced
+        # so its signals outlive start().
+        self._wfs_schema_request_id = 0
+        self._wfs_schema_task = None
+        self._wfs_schema_dialog = None
+
         # Track current tree selection (for folder checkboxes etc.)
         self._current_node_id = None
         self._current_node_is_folder = False
 
+        # Tab 3 FolderTitle / FolderId / LayerTitle edits are queued and
+        # written together 250 ms after the last one, so tabbing through
+        # the fields costs one commit. (column, node_id) -> (value, portal_id)
+        self._pending_title_edits = {}
+        self._title_save_timer = QtCore.QTimer(self)
+        self._title_save_timer.setSingleShot(True)
+        self._title_save_timer.setInterval(250)
+        self._title_save_timer.timeout.connect(self._flush_pending_title_edits)
+
+        # Portal combo changes are applied 50 ms after the last one, so
+        # arrowing through the combo reloads the tree/table once.
+        # handler name -> latest combo index
+        self._pending_portal_changes = {}
+        self._portal_refresh_timer = QtCore.QTimer(self)
+        self._portal_refresh_timer.setSingleShot(True)
+        self._portal_refresh_timer.setInterval(50)
+        self._portal_refresh_timer.timeout.connect(self._run_pending_portal_changes)
+
         # Tab 1 state
         self._tab1_current_layer_id = None  # MapServerLayerId if loaded from DB
         self._tab1_current_source = None    # 'mapfile' or 'db'
@@ -827,182 +956,75 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
     # ------------------------------------------------------------------
     # Signals (LayerConfig)
     # ------------------------------------------------------------------
-    def _connect_layerconfig_signals(self):
+    # (widget attribute, signal, handler method) for _connect_layerconfig_signals.
+    # Widgets missing from the loaded .ui are skipped.
+    _LAYERCONFIG_SIGNAL_TABLE = (
         # Tab 1
-        if hasattr(self, "btnBrowseMapFile"):
-            self.btnBrowseMapFile.clicked.connect(self.on_browse_mapfile)
-
-        if hasattr(self, "btnScanMapFile"):
-            self.btnScanMapFile.clicked.connect(self.on_scan_mapfile)
-
-        if hasattr(self, "cmbMapFileLayerNames"):
-            self.cmbMapFileLayerNames.currentTextChanged.connect(
-                self.on_map_layer_selected
-            )
-
-            # Load fields from WFS on demand
-        if hasattr(self, "btnLoadFieldsFromWFS"):
-            self.btnLoadFieldsFromWFS.clicked.connect(self.on_load_fields_from_wfs)
-
-            # make current Tab 1 layer available to portals
-        if hasattr(self, "btnMakeLayerAvailable"):
-            self.btnMakeLayerAvailable.clicked.connect(
-                self.on_make_layer_available
-            )
-
-            # Load existing layers from DB (Tab 1)
-        if hasattr(self, "cmbDbLayers"):
-            # no signal for change needed yet, we drive via the button
-            pass
-
-        if hasattr(self, "btnLoadFromDb"):
-            self.btnLoadFromDb.clicked.connect(self.on_load_layer_from_db)
-
-        if hasattr(self, "btnCheckFieldsAndStylesFromWFS"):
-            self.btnCheckFieldsAndStylesFromWFS.clicked.connect(self.on_check_wfs_for_updates)
-
+        ("btnBrowseMapFile", "clicked", "on_browse_mapfile"),
+        ("btnScanMapFile", "clicked", "on_scan_mapfile"),
+        ("cmbMapFileLayerNames", "currentTextChanged", "on_map_layer_selected"),
+        # Load fields from WFS on demand
+        ("btnLoadFieldsFromWFS", "clicked", "on_load_fields_from_wfs"),
+        # make current Tab 1 layer available to portals
+        ("btnMakeLayerAvailable", "clicked", "on_make_layer_available"),
+        # Load existing layers from DB (Tab 1); cmbDbLayers is driven via the button
+        ("btnLoadFromDb", "clicked", "on_load_layer_from_db"),
+        ("btnCheckFieldsAndStylesFromWFS", "clicked", "on_check_wfs_for_updates"),
         # Save current Tab 1 state to DB
-        if hasattr(self, "btnSaveLayerToDb"):
-            self.btnSaveLayerToDb.clicked.connect(self.on_save_layer_to_db_clicked)
-
-        # Reorder Styles
-        if hasattr(self, "btnStyleMoveUp"):
-            self.btnStyleMoveUp.clicked.connect(self.on_tab1_style_move_up)
-        if hasattr(self, "btnStyleMoveDown"):
-            self.btnStyleMoveDown.clicked.connect(self.on_tab1_style_move_down)
-        # Delete Style
-        if hasattr(self, "btnStyleDelete"):
-            self.btnStyleDelete.clicked.connect(self.on_tab1_style_delete)
-
+        ("btnSaveLayerToDb", "clicked", "on_save_layer_to_db_clicked"),
+        # Reorder / delete styles
+        ("btnStyleMoveUp", "clicked", "on_tab1_style_move_up"),
+        ("btnStyleMoveDown", "clicked", "on_tab1_style_move_down"),
+        ("btnStyleDelete", "clicked", "on_tab1_style_delete"),
         # ORDERBY table
-        if hasattr(self, "btnAddOrderBy"):
-            self.btnAddOrderBy.clicked.connect(self.on_tab1_add_orderby_row)
-        if hasattr(self, "btnRemoveOrderBy"):
-            self.btnRemoveOrderBy.clicked.connect(self.on_tab1_remove_orderby_row)
+        ("btnAddOrderBy", "clicked", "on_tab1_add_orderby_row"),
+        ("btnRemoveOrderBy", "clicked", "on_tab1_remove_orderby_row"),
 
-        # ------------------------------------------------------------------
         # Tab 2: portal layer assignment + export
-        # ------------------------------------------------------------------
-        if hasattr(self, "btnExportCurrentPortalLayersJson"):
-            self.btnExportCurrentPortalLayersJson.clicked.connect(
-                self.on_btnExportPortalLayerJson_clicked
-            )
-
-        if hasattr(self, "btnExportAllPortalsLayersJson"):
-            self.btnExportAllPortalsLayersJson.clicked.connect(
-                self.on_export_all_portals_layers_json
-            )
-
-        if hasattr(self, "cmbPortalSelect"):
-            self.cmbPortalSelect.currentIndexChanged.connect(
-                self.on_portal_changed
-                )
-
-        if hasattr(self, "tblPortalLayers"):
-            self.tblPortalLayers.itemSelectionChanged.connect(
-                self._tab2_update_action_buttons
-            )
-
-        if hasattr(self, "tblAllLayers"):
-            self.tblAllLayers.itemSelectionChanged.connect(
-                self._tab2_update_action_buttons
-            )
-
-        if hasattr(self, "btnAddLayerToPortalAsWms"):
-            self.btnAddLayerToPortalAsWms.clicked.connect(
-                self.on_add_layer_to_portal_as_wms_clicked
-            )
-
-        if hasattr(self, "btnAddLayerToPortalAsWfs"):
-            self.btnAddLayerToPortalAsWfs.clicked.connect(
-                self.on_add_layer_to_portal_as_wfs_clicked
-            )
-
-        if hasattr(self, "btnAddLayerToPortalAsSwitch"):
-            self.btnAddLayerToPortalAsSwitch.clicked.connect(
-                self.on_add_layer_to_portal_as_switch_clicked
-            )
-
-        if hasattr(self, "btnRemoveLayerFromPortal"):
-            self.btnRemoveLayerFromPortal.clicked.connect(
-                self.on_remove_layer_from_portal_clicked
-            )
-
-        if hasattr(self, "cmbPortalSelectLayers"):
-            self.cmbPortalSelectLayers.currentIndexChanged.connect(
-                self.on_portal_layers_portal_changed
-            )
-
-        # Tab 3/2
-
-            # tree editing
-        if hasattr(self, "btnAddFolderNode"):
-            self.btnAddFolderNode.clicked.connect(self.on_add_folder_node)
-
-        if hasattr(self, "btnDeleteNode"):
-            self.btnDeleteNode.clicked.connect(self.on_delete_selected_node)
-
-            # folder checkboxes
-        if hasattr(self, "chkFolderExpanded"):
-            self.chkFolderExpanded.toggled.connect(self.on_folder_expanded_toggled)
-        if hasattr(self, "chkFolderChecked"):
-            self.chkFolderChecked.toggled.connect(self.on_folder_checked_toggled)
-        if hasattr(self, "chkFolderExcluded"):
-            self.chkFolderExcluded.toggled.connect(self.on_folder_excluded_toggled)
-
-            # add selected layer to portal tree
-        if hasattr(self, "btnAddLayerAsWMS"):
-            self.btnAddLayerAsWMS.clicked.connect(self.on_add_layer_as_wms)
-
-        if hasattr(self, "btnAddLayerAsWFS"):
-            self.btnAddLayerAsWFS.clicked.connect(self.on_add_layer_as_wfs)
-
-            # Export JSON for current portal
-        if hasattr(self, "btnExportCurrentPortalJson"):
-            self.btnExportCurrentPortalJson.clicked.connect(
-                self.on_export_current_portal_tree_json
-            )
-
-        # Export JSON for all portals (trees)
-        if hasattr(self, "btnExportAllPortalsJson"):
-            self.btnExportAllPortalsJson.clicked.connect(
-                self.on_export_all_portals_tree_json
-            )
-
-            # Folder title change
-        if hasattr(self, "txtFolderTitle"):
-            self.txtFolderTitle.editingFinished.connect(
-                self.on_folder_title_edited
-                )
-
-            # Folder Id change
-        if hasattr(self, "txtFolderId"):
-            self.txtFolderId.editingFinished.connect(
-                self.on_folder_id_edited
-            )
-
-            # Folder title change
-        if hasattr(self, "txtLayerTitle"):
-            self.txtLayerTitle.editingFinished.connect(
-                self.on_layer_title_edited
-            )
-
-            # Move up/down + collapse all in treePortalLayers
-        if hasattr(self, "btnMoveUp"):
-            self.btnMoveUp.clicked.connect(self.on_tab3_move_up)
-
-        if hasattr(self, "btnMoveDown"):
-            self.btnMoveDown.clicked.connect(self.on_tab3_move_down)
-
-        if hasattr(self, "btnCollapseAll"):
-            self.btnCollapseAll.clicked.connect(self.on_tab3_collapse_all)
-
-        if hasattr(self, "btnMirrorTree"):
-            self.btnMirrorTree.clicked.connect(self.on_tab3_mirror_tree)
-
-        if hasattr(self, "btnExpandAll"):
-            self.btnExpandAll.clicked.connect(self.on_tab3_expand_all)
+        ("btnExportCurrentPortalLayersJson", "clicked", "on_btnExportPortalLayerJson_clicked"),
+        ("btnExportAllPortalsLayersJson", "clicked", "on_export_all_portals_layers_json"),
+        ("cmbPortalSelect", "currentIndexChanged", "_queue_portal_changed"),
+        ("tblPortalLayers", "itemSelectionChanged", "_tab2_update_action_buttons"),
+        ("tblAllLayers", "itemSelectionChanged", "_tab2_update_action_buttons"),
+        ("btnAddLayerToPortalAsWms", "clicked", "on_add_layer_to_portal_as_wms_clicked"),
+        ("btnAddLayerToPortalAsWfs", "clicked", "on_add_layer_to_portal_as_wfs_clicked"),
+        ("btnAddLayerToPortalAsSwitch", "clicked", "on_add_layer_to_portal_as_switch_clicked"),
+        ("btnRemoveLayerFromPortal", "clicked", "on_remove_layer_from_portal_clicked"),
+        ("cmbPortalSelectLayers", "currentIndexChanged", "_queue_portal_layers_portal_changed"),
+
+        # Tab 3/2: tree editing
+        ("btnAddFolderNode", "clicked", "on_add_folder_node"),
+        ("btnDeleteNode", "clicked", "on_delete_selected_node"),
+        # folder checkboxes
+        ("chkFolderExpanded", "toggled", "on_folder_expanded_toggled"),
+        ("chkFolderChecked", "toggled", "on_folder_checked_toggled"),
+        ("chkFolderExcluded", "toggled", "on_folder_excluded_toggled"),
+        # add selected layer to portal tree
+        ("btnAddLayerAsWMS", "clicked", "on_add_layer_as_wms"),
+        ("btnAddLayerAsWFS", "clicked", "on_add_layer_as_wfs"),
+        # Export JSON for current / all portals (trees)
+        ("btnExportCurrentPortalJson", "clicked", "on_export_current_portal_tree_json"),
+        ("btnExportAllPortalsJson", "clicked", "on_export_all_portals_tree_json"),
+        # Folder title / id, layer title edits
+        ("txtFolderTitle", "editingFinished", "on_folder_title_edited"),
+        ("txtFolderId", "editingFinished", "on_folder_id_edited"),
+        ("txtLayerTitle", "editingFinished", "on_layer_title_edited"),
+        # Move up/down + collapse/expand all in treePortalLayers
+        ("btnMoveUp", "clicked", "on_tab3_move_up"),
+        ("btnMoveDown", "clicked", "on_tab3_move_down"),
+        ("btnCollapseAll", "clicked", "on_tab3_collapse_all"),
+        ("btnMirrorTree", "clicked", "on_tab3_mirror_tree"),
+        ("btnExpandAll", "clicked", "on_tab3_expand_all"),
+        # Roles
+        ("btnToggleRoles", "clicked", "_tab3_toggle_roles"),
+        ("listLayerRoles", "itemChanged", "_tab3_save_node_roles"),
+    )
 
+    def _connect_layerconfig_signals(self):
+        for attr, signal, handler in self._LAYERCONFIG_SIGNAL_TABLE:
+            widget = getattr(self, attr, None)
+            if widget is not None:
+                getattr(widget, signal).connect(getattr(self, handler))
 
         # Tab 3: Layer icon dropdown (leaf nodes only)
         if hasattr(self, "cmbLayerIconType"):
@@ -1012,12 +1034,6 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 pass
             self.cmbLayerIconType.currentIndexChanged.connect(self.on_tab3_icon_combo_changed)
 
-        if hasattr(self, "btnToggleRoles"):
-            self.btnToggleRoles.clicked.connect(self._tab3_toggle_roles)
-
-        if hasattr(self, "listLayerRoles"):
-            self.listLayerRoles.itemChanged.connect(self._tab3_save_node_roles)
-
     # ------------------------------------------------------------------
     # Tab 1: Mapfile loading
     # ------------------------------------------------------------------
@@ -1053,7 +1069,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             )
             return
 
-        layers_by_name, error = parse_mapfile(map_path)
+        layers_by_name, error = parse_mapfile_cached(map_path)
         if error:
             QtWidgets.QMessageBox.critical(self, "Mapfile error", error)
             self._mapfile_layers = {}
@@ -1064,8 +1080,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
         self.cmbMapFileLayerNames.blockSignals(True)
         self.cmbMapFileLayerNames.clear()
-        for name in sorted(layers_by_name.keys()):
-            self.cmbMapFileLayerNames.addItem(name)
+        self.cmbMapFileLayerNames.addItems(sorted(layers_by_name))
         self.cmbMapFileLayerNames.blockSignals(False)
 
         if self._mapfile_layers:
@@ -1209,7 +1224,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         if not path:
             return False  # user cancelled
 
-        layers, err = parse_mapfile(path)
+        layers, err = parse_mapfile_cached(path)
         if err:
             self._error("Mapfile error", err)
             return False
@@ -1248,6 +1263,8 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._error("No mapfile", "No current mapfile path is set.")
             return False
 
+        # Uncached: the cache key only covers the top-level file, not its
+        # INCLUDEd fragments, and this path exists to pick up edits
         layers, err = parse_mapfile(path)
         if err:
             self._error("Mapfile error", err)
@@ -1334,108 +1351,115 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
           4 ToolTip alias
 
         The field type is stored in the Field name cell's UserRole.
-        """
-        dlg = self._show_busy_dialog(
-            "Loading WFS fields",
-            "Querying WFS and building fields list, this can take ~30 seconds.",
-        )
-        try:
-            if not (hasattr(self, "tblFields") and hasattr(self, "cmbIdProperty")):
-                return
-
-            layer_name = (
-                self.txtLayerName.text().strip() if hasattr(self, "txtLayerName") else ""
-            )
-            if not layer_name:
-                self._error("No layer selected", "Select a layer from the mapfile first.")
-                return
-
-            # Optional: need the mapfile layer dict for metadata hints
-            lyr_dict = self._mapfile_layers.get(layer_name, {})
 
-            # 1) Get schema from WFS
-            try:
-                schema = self.fetch_wfs_schema(layer_name)  # {field_name: type}
-            except Exception as exc:
-                msg = f"Failed to fetch WFS schema for '{layer_name}':\n{exc}"
-                self._error("WFS schema error", msg)
-                return
+        The DescribeFeatureType request runs on QThreadPool so the UI keeps
+        painting while it waits (up to the 180 s timeout); the table is
+        filled by _apply_wfs_schema when it returns.
+        """
+        if not (hasattr(self, "tblFields") and hasattr(self, "cmbIdProperty")):
+            return
 
-            # 2) Optional id hint from mapfile METADATA
-            metadata = lyr_dict.get("metadata", {}) or {}
-            id_prop = (metadata.get("wfs_featureid") or "").strip() or (
-                metadata.get("gml_featureid") or ""
-            ).strip()
+        layer_name = (
+            self.txtLayerName.text().strip() if hasattr(self, "txtLayerName") else ""
+        )
+        if not layer_name:
+            self._error("No layer selected", "Select a layer from the mapfile first.")
+            return
 
-            tbl = self.tblFields
+        self._wfs_schema_request_id += 1
+        request_id = self._wfs_schema_request_id
 
-            tbl.blockSignals(True)
-            self.cmbIdProperty.blockSignals(True)
-            try:
-                tbl.clearContents()
-                tbl.setRowCount(0)
-                self.cmbIdProperty.clear()
+        if self._wfs_schema_dialog is not None:
+            self._wfs_schema_dialog.close()
+        self._wfs_schema_dialog = self._show_busy_dialog(
+            "Loading WFS fields",
+            "Querying WFS and building fields list, this can take ~30 seconds.",
+        )
 
-                field_names = list(schema.keys())
+        fetch = self.fetch_wfs_schema
+        task = _WfsSchemaTask(request_id, lambda: fetch(layer_name))
+        task.signals.finished.connect(
+            lambda rid, schema: self._on_wfs_schema_ready(rid, layer_name, schema)
+        )
+        task.signals.failed.connect(
+            lambda rid, err: self._on_wfs_schema_failed(rid, layer_name, err)
+        )
+        self._wfs_schema_task = task
+        QtCore.QThreadPool.globalInstance().start(task)
 
-                COL_FIELD = 0
-                COL_IDPROP = 1
-                COL_INCLUDE = 2
-                COL_TOOLTIP = 3
-                COL_TOOLTIP_ALIAS = 4
+    def _finish_wfs_schema_request(self, request_id: int) -> bool:
+        """
+        Close the busy dialog for request_id. Returns False for a stale
+        request (a newer one was started), whose result must be ignored.
+        """
+        if request_id != self._wfs_schema_request_id:
+            return False
+        if self._wfs_schema_dialog is not None:
+            self._wfs_schema_dialog.close()
+            self._wfs_schema_dialog = None
+        self._wfs_schema_task = None
+        return True
 
-                for idx, fname in enumerate(field_names):
-                    ftype = schema[fname] or "string"
+    def _on_wfs_schema_failed(self, request_id: int, layer_name: str, error: str):
+        if not self._finish_wfs_schema_request(request_id):
+            return
+        msg = f"Failed to fetch WFS schema for '{layer_name}':\n{error}"
+        self._error("WFS schema error", msg)
 
-                    tbl.insertRow(idx)
+    def _on_wfs_schema_ready(self, request_id: int, layer_name: str, schema: dict):
+        if not self._finish_wfs_schema_request(request_id):
+            return
+        self._apply_wfs_schema(layer_name, schema)
 
-                    name_item = QtWidgets.QTableWidgetItem(fname)
-                    name_item.setData(QtCore.Qt.UserRole, ftype or "string")
-                    name_item.setData(QtCore.Qt.UserRole + 1, fname)
-                    # read-only field name
-                    name_item.setFlags(name_item.flags() & ~QtCore.Qt.ItemIsEditable)
-                    tbl.setItem(idx, COL_FIELD, name_item)
+    def _apply_wfs_schema(self, layer_name: str, schema: dict):
+        """
+        Fill tblFields and cmbIdProperty from a {field_name: type} schema
+        fetched for layer_name (see on_load_fields_from_wfs).
+        """
+        if not (hasattr(self, "tblFields") and hasattr(self, "cmbIdProperty")):
+            return
 
-                    id_item = QtWidgets.QTableWidgetItem()
-                    id_item.setFlags(id_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    id_item.setCheckState(QtCore.Qt.Unchecked)
-                    tbl.setItem(idx, COL_IDPROP, id_item)
+        # Optional: need the mapfile layer dict for metadata hints
+        lyr_dict = self._mapfile_layers.get(layer_name, {})
 
-                    include_item = QtWidgets.QTableWidgetItem()
-                    include_item.setFlags(include_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    include_item.setCheckState(QtCore.Qt.Unchecked)
-                    tbl.setItem(idx, COL_INCLUDE, include_item)
+        # Optional id hint from mapfile METADATA
+        metadata = lyr_dict.get("metadata", {}) or {}
+        id_prop = (metadata.get("wfs_featureid") or "").strip() or (
+            metadata.get("gml_featureid") or ""
+        ).strip()
 
-                    tooltip_item = QtWidgets.QTableWidgetItem()
-                    tooltip_item.setFlags(tooltip_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    tooltip_item.setCheckState(QtCore.Qt.Unchecked)
-                    tbl.setItem(idx, COL_TOOLTIP, tooltip_item)
+        tbl = self.tblFields
 
-                    alias_item = QtWidgets.QTableWidgetItem("")
-                    tbl.setItem(idx, COL_TOOLTIP_ALIAS, alias_item)
+        tbl.blockSignals(True)
+        self.cmbIdProperty.blockSignals(True)
+        try:
+            self.cmbIdProperty.clear()
 
-                    self.cmbIdProperty.addItem(fname)
+            field_names = list(schema.keys())
 
-                    # If we got an id hint, select it in the combo
-                    if id_prop and self.cmbIdProperty.count() > 0:
-                        combo_idx = self.cmbIdProperty.findText(id_prop)
-                        if combo_idx >= 0:
-                            self.cmbIdProperty.setCurrentIndex(combo_idx)
+            self._fill_fields_table(tbl, _fields_rows_from_schema(schema))
 
-                    # If no hint matched, default to first field
-                    if self.cmbIdProperty.count() > 0 and self.cmbIdProperty.currentIndex() < 0:
-                        self.cmbIdProperty.setCurrentIndex(0)
+            self.cmbIdProperty.addItems(field_names)
+            # Schema keys are unique, so combo index == position in field_names
+            combo_idx_by_name = {fname: idx for idx, fname in enumerate(field_names)}
 
-            finally:
-                tbl.blockSignals(False)
-                self.cmbIdProperty.blockSignals(False)
+            # If we got an id hint, select it in the combo
+            if id_prop and self.cmbIdProperty.count() > 0:
+                combo_idx = combo_idx_by_name.get(id_prop, -1)
+                if combo_idx >= 0:
+                    self.cmbIdProperty.setCurrentIndex(combo_idx)
 
-            # Wire once and sync once
-            self._wire_tab1_idproperty_sync()
-            self._on_tab1_idproperty_combo_changed(self.cmbIdProperty.currentIndex())
+            # If no hint matched, default to first field
+            if self.cmbIdProperty.count() > 0 and self.cmbIdProperty.currentIndex() < 0:
+                self.cmbIdProperty.setCurrentIndex(0)
 
         finally:
-            dlg.close()
+            tbl.blockSignals(False)
+            self.cmbIdProperty.blockSignals(False)
+
+        # Wire once and sync once
+        self._wire_tab1_idproperty_sync()
+        self._on_tab1_idproperty_combo_changed(self.cmbIdProperty.currentIndex())
 
     def on_check_wfs_for_updates(self):
         """
@@ -1714,6 +1738,56 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         # Use the helper so _tab1_current_layer_id is set
         self._load_tab1_layer_by_id(int(layer_id), show_message=False)
 
+    def _fill_fields_table(self, tbl, rows):
+        """
+        Fill tblFields in one batch.
+
+        rows: FieldRows (_fields_rows_from_schema / _fields_rows_from_db),
+        in display order. Column layout as described in
+        on_load_fields_from_wfs.
+
+        Repaints, sorting and signals are suspended and the row count is set
+        once, so Qt does one layout pass instead of one per row/cell.
+        """
+        COL_FIELD = 0
+        COL_IDPROP = 1
+        COL_INCLUDE = 2
+        COL_TOOLTIP = 3
+        COL_TOOLTIP_ALIAS = 4
+
+        def check_item(checked):
+            item = QtWidgets.QTableWidgetItem()
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Checked if checked else QtCore.Qt.Unchecked)
+            return item
+
+        tbl.setUpdatesEnabled(False)
+        was_blocked = tbl.blockSignals(True)
+        was_sorting = tbl.isSortingEnabled()
+        tbl.setSortingEnabled(False)
+        try:
+            tbl.clearContents()
+            tbl.setRowCount(len(rows))
+
+            for row_idx, (fname, ftype, is_id_prop, include, is_tooltip, alias) in enumerate(rows):
+                name_item = QtWidgets.QTableWidgetItem(fname)
+                # Field type in UserRole, canonical/original field name (used on save) in UserRole + 1
+                name_item.setData(QtCore.Qt.UserRole, ftype)
+                name_item.setData(QtCore.Qt.UserRole + 1, fname)
+                # read-only field name
+                name_item.setFlags(name_item.flags() & ~QtCore.Qt.ItemIsEditable)
+                tbl.setItem(row_idx, COL_FIELD, name_item)
+
+                tbl.setItem(row_idx, COL_IDPROP, check_item(is_id_prop))
+                tbl.setItem(row_idx, COL_INCLUDE, check_item(include))
+                tbl.setItem(row_idx, COL_TOOLTIP, check_item(is_tooltip))
+                tbl.setItem(row_idx, COL_TOOLTIP_ALIAS, QtWidgets.QTableWidgetItem(alias))
+        finally:
+            tbl.setSortingEnabled(was_sorting)
+            tbl.blockSignals(was_blocked)
+            tbl.setUpdatesEnabled(True)
+            tbl.viewport().update()
+
     def _populate_tab1_from_db(self, details: dict):
         """Populate Tab 1 controls from a DB layer details dict."""
         layer = details.get("layer")
@@ -1832,82 +1906,24 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             tbl.blockSignals(True)
             self.cmbIdProperty.blockSignals(True)
             try:
-                tbl.clearContents()
-                tbl.setRowCount(0)
                 self.cmbIdProperty.clear()
 
-                COL_FIELD = 0
-                COL_IDPROP = 1
-                COL_INCLUDE = 2
-                COL_TOOLTIP = 3
-                COL_TOOLTIP_ALIAS = 4
-
                 id_prop_name = ""
                 if wfs is not None and wfs.get("IdPropertyName"):
                     id_prop_name = (wfs.get("IdPropertyName") or "").strip()
 
-                wfs_fields = self.db.get_wfs_service_layer_fields(layer["MapServerLayerId"])
-                wfs_by_name = {r["FieldName"]: (dict(r) if not isinstance(r, dict) else r) for r in wfs_fields}
-
-                id_combo_index = -1
-
-                for row_idx, f in enumerate(fields):
-                    tbl.insertRow(row_idx)
-
-                    fname = f["FieldName"]
-                    ftype = f["FieldType"]
-                    include_csv = bool(f["IncludeInPropertyCsv"])
-                    is_id_prop = bool(f["IsIdProperty"])
-
-                    sf = wfs_by_name.get(fname)
-                    if sf is not None:
-                        include_effective = bool(sf["IncludeInPropertyname"])
-                        is_tooltip = bool(sf["IsTooltip"])
-                        tooltip_alias = sf["TooltipAlias"] or ""
-                    else:
-                        include_effective = include_csv
-                        is_tooltip = False
-                        tooltip_alias = ""
-
-                    name_item = QtWidgets.QTableWidgetItem(fname)
-                    # Store type as before
-                    name_item.setData(QtCore.Qt.UserRole, ftype or "string")
-                    # Store canonical/original field name separately (used on save)
-                    name_item.setData(QtCore.Qt.UserRole + 1, fname)
-                    # Make FieldName read-only
-                    name_item.setFlags(name_item.flags() & ~QtCore.Qt.ItemIsEditable)
-
-                    tbl.setItem(row_idx, COL_FIELD, name_item)
-
-                    id_item = QtWidgets.QTableWidgetItem()
-                    id_item.setFlags(id_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    id_item.setCheckState(
-                        QtCore.Qt.Checked
-                        if is_id_prop or (id_prop_name and fname == id_prop_name)
-                        else QtCore.Qt.Unchecked
-                    )
-                    tbl.setItem(row_idx, COL_IDPROP, id_item)
-
-                    include_item = QtWidgets.QTableWidgetItem()
-                    include_item.setFlags(include_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    include_item.setCheckState(
-                        QtCore.Qt.Checked if include_effective else QtCore.Qt.Unchecked
-                    )
-                    tbl.setItem(row_idx, COL_INCLUDE, include_item)
-
-                    tooltip_item = QtWidgets.QTableWidgetItem()
-                    tooltip_item.setFlags(tooltip_item.flags() | QtCore.Qt.ItemIsUserCheckable)
-                    tooltip_item.setCheckState(
-                        QtCore.Qt.Checked if is_tooltip else QtCore.Qt.Unchecked
-                    )
-                    tbl.setItem(row_idx, COL_TOOLTIP, tooltip_item)
+                wfs_by_name = self.db.get_wfs_service_layer_fields_by_name(layer["MapServerLayerId"])
 
-                    alias_item = QtWidgets.QTableWidgetItem(tooltip_alias)
-                    tbl.setItem(row_idx, COL_TOOLTIP_ALIAS, alias_item)
+                table_rows = _fields_rows_from_db(fields, wfs_by_name, id_prop_name)
+                self._fill_fields_table(tbl, table_rows)
 
-                    self.cmbIdProperty.addItem(fname)
-                    if fname == id_prop_name and id_combo_index < 0:
-                        id_combo_index = self.cmbIdProperty.count() - 1
+                field_names = [r.name for r in table_rows]
+                self.cmbIdProperty.addItems(field_names)
+                # First combo index per name (DB field names may repeat)
+                combo_idx_by_name = {}
+                for idx, fname in enumerate(field_names):
+                    combo_idx_by_name.setdefault(fname, idx)
+                id_combo_index = combo_idx_by_name.get(id_prop_name, -1)
 
                 # After building everything, set combo if we found an idProperty
                 if id_combo_index >= 0:
@@ -2397,34 +2413,12 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             return
 
         try:
-            all_layers = self.db.get_all_layers()
-            usage_rows = self.db.get_layer_portal_usage()
+            # Portal usage comes per layer as a {PortalKey: Status} dict
+            all_layers = self.db.get_all_layers_with_usage()
         except Exception as e:
             self._error("Database error", f"Could not load layers: {e}")
             return
 
-        # Build a mapping: portal_usage[BaseLayerKey][PortalKey] = status
-        portal_usage = {}
-        for row in usage_rows:
-            base_key = row["BaseLayerKey"]
-            portal_key = row["PortalKey"]
-            has_wms = row["HasWms"] or 0
-            has_wfs = row["HasWfs"] or 0
-            has_switch = row["HasSwitch"] or 0
-
-            if has_switch:
-                status = "Switch"
-            elif has_wms and has_wfs:
-                status = "WMS+VECTOR"
-            elif has_wms:
-                status = "WMS"
-            elif has_wfs:
-                status = "VECTOR"
-            else:
-                status = "Off"
-
-            portal_usage.setdefault(base_key, {})[portal_key] = status
-
         table = self.tblAllLayers
 
         # Make selection behave consistently (row-based, single selection)
@@ -2440,45 +2434,45 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         hdr.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeToContents)
         hdr.setSectionResizeMode(2, QtWidgets.QHeaderView.Stretch)
 
-        table.setSortingEnabled(False)
-        table.setRowCount(0)
-        table.setRowCount(len(all_layers))
-
-        for row_idx, layer in enumerate(all_layers):
-            map_name = layer["MapLayerName"]
-            base_key = layer["BaseLayerKey"]
-
-            usage_for_layer = portal_usage.get(base_key, {})
-
-            # Build "In portals" string - only portals where status != Off
-            fragments = []
-            for portal_key in sorted(usage_for_layer.keys()):
-                status = usage_for_layer[portal_key]
-                if status and status != "Off":
-                    fragments.append(f"{portal_key}: {status}")
-            in_portals = "\n".join(fragments) if fragments else "—"
-
-            item_name = QtWidgets.QTableWidgetItem(map_name)
-
-            meta = {
-                "mapLayerId": layer["MapServerLayerId"],
-                "baseLayerKey": base_key,
-                "mapLayerName": map_name,
-                "services": {
-                    "WMS": bool(layer["HasWms"]),
-                    "WFS": bool(layer["HasWfs"]),
-                    "XYZ": bool(layer["IsXYZ"]),
-                },
-                "portalUsage": usage_for_layer,
-            }
-            item_name.setData(QtCore.Qt.UserRole, meta)
-
-            table.setItem(row_idx, 0, item_name)
-            table.setItem(row_idx, 1, QtWidgets.QTableWidgetItem(base_key))
-            item_in = QtWidgets.QTableWidgetItem(in_portals)
-            item_in.setToolTip(in_portals)  # full list on hover
-            item_in.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
-            table.setItem(row_idx, 2, item_in)
+        # Suspend repaints while filling; resize once they are back on
+        table.setUpdatesEnabled(False)
+        try:
+            table.setSortingEnabled(False)
+            table.setRowCount(0)
+            table.setRowCount(len(all_layers))
+
+            # Unpacked in get_all_layers_with_usage() column order
+            for row_idx, (
+                layer_id, map_name, base_key, is_xyz, has_wms, has_wfs, usage_for_layer
+            ) in enumerate(all_layers):
+                # "In portals" lists only portals where the layer is not Off;
+                # portal_usage maps PortalKey -> status for the Tab 2 buttons.
+                in_portals = "\n".join(
+                    f"{portal_key}: {status}"
+                    for portal_key, status in usage_for_layer.items()
+                ) or "—"
+
+                item_name = QtWidgets.QTableWidgetItem(map_name)
+
+                meta = AllLayersMeta(
+                    layer_id,
+                    base_key,
+                    map_name,
+                    bool(has_wms),
+                    bool(has_wfs),
+                    bool(is_xyz),
+                    usage_for_layer,
+                )
+                item_name.setData(QtCore.Qt.UserRole, meta)
+
+                table.setItem(row_idx, 0, item_name)
+                table.setItem(row_idx, 1, QtWidgets.QTableWidgetItem(base_key))
+                item_in = QtWidgets.QTableWidgetItem(in_portals)
+                item_in.setToolTip(in_portals)  # full list on hover
+                item_in.setTextAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
+                table.setItem(row_idx, 2, item_in)
+        finally:
+            table.setUpdatesEnabled(True)
 
         table.resizeColumnsToContents()
         table.resizeRowsToContents()
@@ -2518,11 +2512,13 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
     def on_portal_layers_portal_changed(self, idx: int):
         """
         Called when cmbPortalSelectLayers changes.
-        Refreshes both portal entries and the global 'In portals' view.
+        Refreshes the portal entries. tblAllLayers lists usage across every
+        portal, so its rows don't change with the selection; only the Tab 2
+        buttons (selected layer vs. new portal) need re-evaluating.
         """
         self._sync_portal_combo_from_tab2()
         self._refresh_portal_layers_table()
-        self._refresh_all_layers_table()
+        self._tab2_update_action_buttons()
 
     def _get_selected_all_layers_meta(self):
         if not hasattr(self, "tblAllLayers"):
@@ -2562,18 +2558,25 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         # Adjust if you stored it elsewhere
         # Recommended location: json_generator/xyz_layers.json
         here = os.path.dirname(os.path.abspath(__file__))
-        # Look in json_generator directory
-        path = os.path.join(os.path.dirname(here), "json_generator", "xyz_layers.json")
-        if not os.path.exists(path):
+        candidates = (
+            # Look in json_generator directory
+            os.path.join(os.path.dirname(here), "json_generator", "xyz_layers.json"),
             # Fallback: same directory as this file
-            path = os.path.join(here, "xyz_layers.json")
+            os.path.join(here, "xyz_layers.json"),
+        )
 
-        if not os.path.exists(path):
+        # Open directly rather than exists() + open(): one syscall per candidate.
+        data = None
+        for path in candidates:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                break
+            except FileNotFoundError:
+                continue
+        if data is None:
             return []
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
         layers = data.get("layers") if isinstance(data, dict) else None
         if not isinstance(layers, list):
             return []
@@ -2658,16 +2661,11 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 )
                 return
 
-            conn = self.db.conn
-            errors = []
-            for row in portals:
-                portal_key = row["PortalKey"]
-                filename = f"{portal_key}.json"
-                out_path = os.path.join(out_dir, filename)
-                try:
-                    layer_export.export_portal_layer_json(conn, portal_key, out_path)
-                except Exception as e:
-                    errors.append(f"{portal_key}: {e}")
+            errors = layer_export.export_portals_batch(
+                self.db.conn,
+                [(row["PortalId"], row["PortalKey"]) for row in portals],
+                out_dir,
+            )
 
             if errors:
                 QtWidgets.QMessageBox.warning(
@@ -2751,27 +2749,34 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 }
             )
 
-        table.setRowCount(len(rows))
+        # Suspend repaints and signals while filling; resize once afterwards
+        table.setUpdatesEnabled(False)
+        was_blocked = table.blockSignals(True)
+        try:
+            table.setRowCount(len(rows))
 
-        for row_idx, r in enumerate(rows):
-            layer_key = r["LayerKey"]
-            layer_name = r["LayerName"]
-            service = r["Service"]
+            for row_idx, r in enumerate(rows):
+                layer_key = r["LayerKey"]
+                layer_name = r["LayerName"]
+                service = r["Service"]
 
-            item_key = QtWidgets.QTableWidgetItem(layer_key)
+                item_key = QtWidgets.QTableWidgetItem(layer_key)
 
-            meta = {
-                "EntryType": r["EntryType"],
-                "LayerKey": layer_key,
-                "Service": service,
-                "PortalLayerId": r["PortalLayerId"],
-                "PortalSwitchLayerId": r["PortalSwitchLayerId"],
-            }
-            item_key.setData(QtCore.Qt.UserRole, meta)
+                meta = {
+                    "EntryType": r["EntryType"],
+                    "LayerKey": layer_key,
+                    "Service": service,
+                    "PortalLayerId": r["PortalLayerId"],
+                    "PortalSwitchLayerId": r["PortalSwitchLayerId"],
+                }
+                item_key.setData(QtCore.Qt.UserRole, meta)
 
-            table.setItem(row_idx, 0, item_key)
-            table.setItem(row_idx, 1, QtWidgets.QTableWidgetItem(layer_name))
-            table.setItem(row_idx, 2, QtWidgets.QTableWidgetItem(service))
+                table.setItem(row_idx, 0, item_key)
+                table.setItem(row_idx, 1, QtWidgets.QTableWidgetItem(layer_name))
+                table.setItem(row_idx, 2, QtWidgets.QTableWidgetItem(service))
+        finally:
+            table.blockSignals(was_blocked)
+            table.setUpdatesEnabled(True)
 
         table.resizeColumnsToContents()
         table.setSortingEnabled(True)
@@ -2802,7 +2807,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._error("No layer selected", "Select a layer in the global list first.")
             return
 
-        base_key = meta["baseLayerKey"]
+        base_key = meta.base_key
 
         try:
             wms = self.db.get_service_layer_for_base(base_key, "WMS")
@@ -2835,7 +2840,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._error("No layer selected", "Select a layer in the global list first.")
             return
 
-        base_key = meta["baseLayerKey"]
+        base_key = meta.base_key
 
         try:
             wfs = self.db.get_service_layer_for_base(base_key, "WFS")
@@ -2868,7 +2873,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._error("No layer selected", "Select a layer in the global list first.")
             return
 
-        base_key = meta["baseLayerKey"]
+        base_key = meta.base_key
 
         # Default switch key suggestion
         default_switch_key = f"{base_key}_SWITCH"
@@ -2962,7 +2967,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                     "Select a layer in the portal list (right) or the global list (left) first.",
                 )
                 return
-            base_key = meta["baseLayerKey"]
+            base_key = meta.base_key
 
         reply = QtWidgets.QMessageBox.question(
             self,
@@ -3005,7 +3010,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         Dynamic rules based on selected layer vs active portal.
 
         - Requires a portal selection + a selected row in tblAllLayers.
-        - Uses meta['portalUsage'] from _refresh_all_layers_table (no extra DB queries).
+        - Uses meta.portal_usage from _refresh_all_layers_table (no extra DB queries).
         - Add buttons enabled for each service type not yet in portal (allow both WMS+WFS independently).
         - Add button availability respects services (WMS/WFS exist on the layer).
         - Remove enabled only when the layer IS present in the portal.
@@ -3026,14 +3031,13 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._tab2_set_button_enabled("btnRemoveLayerFromPortal", False)
             return
 
-        usage_for_layer = meta.get("portalUsage") or {}
+        usage_for_layer = meta.portal_usage
         status = usage_for_layer.get(portal_key)  # "WMS"/"VECTOR"/"WMS+VECTOR"/"Switch"/"Off"/None
 
         present = bool(status) and status != "Off"
 
-        services = meta.get("services") or {}
-        has_wms = bool(services.get("WMS"))
-        has_wfs = bool(services.get("WFS"))
+        has_wms = meta.has_wms
+        has_wfs = meta.has_wfs
 
         # Determine which service types are already in the portal for this layer
         wms_in_portal = status in ("WMS", "WMS+VECTOR")
@@ -3088,15 +3092,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         portal_id = self._get_current_portal_id()
         if portal_id is None:
             return None
-
-        cur = self.db.conn.execute(
-            "SELECT PortalKey FROM Portals WHERE PortalId = ?",
-            (portal_id,),
-        )
-        row = cur.fetchone()
-        if row is None:
-            return None
-        return row["PortalKey"]
+        return self._portal_key_by_id.get(portal_id)
 
     def _get_portal_membership_layer_keys(self, portal_id: int) -> set:
         """
@@ -3147,9 +3143,11 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
     def _load_portals(self):
         """
         Populate both portal selection combos (Tab 2 and Tab 3) from the
-        Portals table, keeping a shared _portal_id_by_index list.
+        Portals table, keeping a shared _portal_id_by_index list and the
+        _portal_key_by_id map used by _get_current_portal_key.
         """
         self._portal_id_by_index = []
+        self._portal_key_by_id = {}
 
         portals = self.db.get_portals()
 
@@ -3168,6 +3166,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             portal_title = row["PortalTitle"]
 
             self._portal_id_by_index.append(portal_id)
+            self._portal_key_by_id[portal_id] = portal_key
 
             label = f"{portal_title} ({portal_key})"
 
@@ -3184,6 +3183,26 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         if hasattr(self, "cmbPortalSelectLayers"):
             self.cmbPortalSelectLayers.blockSignals(False)
 
+    def _queue_portal_changed(self, index):
+        self._queue_portal_change("on_portal_changed", index)
+
+    def _queue_portal_layers_portal_changed(self, idx: int):
+        self._queue_portal_change("on_portal_layers_portal_changed", idx)
+
+    def _queue_portal_change(self, handler: str, index: int):
+        """
+        Record the latest index for a portal combo handler and (re)start the
+        refresh timer; only the last index within the interval is applied.
+        """
+        self._pending_portal_changes[handler] = index
+        self._portal_refresh_timer.start()
+
+    def _run_pending_portal_changes(self):
+        pending = self._pending_portal_changes
+        self._pending_portal_changes = {}
+        for handler, index in pending.items():
+            getattr(self, handler)(index)
+
     def on_portal_changed(self, index):
         self._sync_portal_combo_from_tab3()
         if index < 0 or index >= len(self._portal_id_by_index):
@@ -3244,11 +3263,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._tab3_set_icon_combo_value("")
             return
 
-        row = self.db.conn.execute(
-            "SELECT Glyph FROM PortalTreeNodes WHERE PortalTreeNodeId = ?",
-            (node_id,),
-        ).fetchone()
-
+        row = self._tree_nodes_by_id.get(node_id)
         glyph = ((row["Glyph"] if row else "") or "").strip()
         self.cmbLayerIconType.setEnabled(True)
         self._tab3_set_icon_combo_value(glyph)
@@ -3257,7 +3272,11 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         self._tab3_sync_icon_combo_from_selection()
 
     def _load_portal_tree(self, portal_id):
+        self._flush_pending_title_edits()
         rows = self.db.get_portal_tree(portal_id)
+        # Node details for on_tree_selection_changed; kept in step with the
+        # single-column UPDATEs that don't reload the tree.
+        self._tree_nodes_by_id = {r["PortalTreeNodeId"]: dict(r) for r in rows}
 
         self._building_tree = True
         try:
@@ -3270,6 +3289,8 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             folder_font.setBold(True)
 
             items_by_id = {}
+            # Folders to open once the model is on the view (ExpandedDefault)
+            expanded_items = []
 
             for row in rows:
                 is_folder = bool(row["IsFolder"])
@@ -3288,6 +3309,8 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                     for it in (title_item, display_item):
                         it.setForeground(row_colour)
                         it.setFont(folder_font)
+                    if row["ExpandedDefault"]:
+                        expanded_items.append(title_item)
 
                 # Custom metadata (store on BOTH columns so selection from col 1 is safe)
                 for it in (title_item, display_item):
@@ -3304,6 +3327,8 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
                 items_by_id[row["PortalTreeNodeId"]] = (title_item, display_item)
 
+            # The model has no view yet, so appending rows here doesn't
+            # trigger any view updates.
             root = model.invisibleRootItem()
             for row in rows:
                 node_id = row["PortalTreeNodeId"]
@@ -3320,7 +3345,17 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                         parent_title_item = parent_items[0]
                         parent_title_item.appendRow([title_item, display_item])
 
-            self._set_tree_model(model)
+            # One repaint for the model swap plus the folder expansion below.
+            # A new model starts fully collapsed, so only ExpandedDefault
+            # folders need touching (on_tab3_mirror_tree walks every node).
+            tree = self.treePortalLayers
+            tree.setUpdatesEnabled(False)
+            try:
+                self._set_tree_model(model)
+                for item in expanded_items:
+                    tree.setExpanded(model.indexFromItem(item), True)
+            finally:
+                tree.setUpdatesEnabled(True)
 
             # Wire selection changed AFTER model is set
             try:
@@ -3334,8 +3369,6 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             except Exception:
                 pass
 
-            self.on_tab3_mirror_tree()
-
             # If nothing selected, clear details. Otherwise sync the icon combo from selection.
             try:
                 idx = self.treePortalLayers.currentIndex()
@@ -3376,79 +3409,63 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         is_folder = bool(item.data(QtCore.Qt.UserRole + 1))
         return node_id, is_folder
 
-    def _get_portal_present_base_layer_keys(self, portal_id: int) -> set:
+    def _get_portal_present_base_layer_keys(self, portal_id: int) -> frozenset:
         """
         BaseLayerKeys that have at least one representation in the portal.
         Includes direct PortalLayers, switch children, and XYZ (global).
-        """
-        conn = self.db.conn
 
-        # Direct portal layers
-        direct = conn.execute(
-            """
-            SELECT DISTINCT
-                CASE
-                    WHEN sl.ServiceType = 'XYZ' THEN sl.LayerKey
-                    ELSE m.BaseLayerKey
-                END AS BaseLayerKey
-            FROM PortalLayers pl
-            JOIN ServiceLayers sl ON sl.ServiceLayerId = pl.ServiceLayerId
-            LEFT JOIN MapServerLayers m ON m.MapServerLayerId = sl.MapServerLayerId
-            WHERE pl.PortalId = ?
-            """,
-            (portal_id,),
-        ).fetchall()
-
-        # Switch children
-        switch_children = conn.execute(
+        Read-only membership set, built by one UNION query (SQLite does the
+        de-duplication and drops empty keys).
+        """
+        rows = self.db.conn.execute(
             """
-            SELECT DISTINCT
-                CASE
-                    WHEN sl.ServiceType = 'XYZ' THEN sl.LayerKey
-                    ELSE m.BaseLayerKey
-                END AS BaseLayerKey
-            FROM PortalSwitchLayers psl
-            JOIN PortalSwitchLayerChildren psc ON psc.PortalSwitchLayerId = psl.PortalSwitchLayerId
-            JOIN ServiceLayers sl ON sl.ServiceLayerId = psc.ServiceLayerId
-            LEFT JOIN MapServerLayers m ON m.MapServerLayerId = sl.MapServerLayerId
-            WHERE psl.PortalId = ?
+            WITH PortalServiceLayers AS (
+                -- Direct portal layers
+                SELECT pl.ServiceLayerId
+                FROM PortalLayers pl
+                WHERE pl.PortalId = ?
+
+                UNION
+
+                -- Switch children
+                SELECT psc.ServiceLayerId
+                FROM PortalSwitchLayers psl
+                JOIN PortalSwitchLayerChildren psc ON psc.PortalSwitchLayerId = psl.PortalSwitchLayerId
+                WHERE psl.PortalId = ?
+            ),
+            PresentKeys AS (
+                SELECT
+                    CASE
+                        WHEN sl.ServiceType = 'XYZ' THEN sl.LayerKey
+                        ELSE m.BaseLayerKey
+                    END AS BaseLayerKey
+                FROM PortalServiceLayers p
+                JOIN ServiceLayers sl ON sl.ServiceLayerId = p.ServiceLayerId
+                LEFT JOIN MapServerLayers m ON m.MapServerLayerId = sl.MapServerLayerId
+
+                UNION
+
+                -- XYZ layers are injected into every portal by design,
+                -- so treat all XYZ BaseLayerKeys as present everywhere.
+                SELECT LayerKey
+                FROM ServiceLayers
+                WHERE ServiceType = 'XYZ'
+            )
+            SELECT BaseLayerKey
+            FROM PresentKeys
+            WHERE BaseLayerKey IS NOT NULL AND BaseLayerKey <> ''
             """,
-            (portal_id,),
+            (portal_id, portal_id),
         ).fetchall()
 
-        keys = set()
-        keys.update(r["BaseLayerKey"] for r in direct if r["BaseLayerKey"])
-        keys.update(r["BaseLayerKey"] for r in switch_children if r["BaseLayerKey"])
-
-        # XYZ layers are injected into every portal by design,
-        # so treat all XYZ BaseLayerKeys as present everywhere.
-        xyz = conn.execute(
-            """
-            SELECT LayerKey AS BaseLayerKey
-            FROM ServiceLayers
-            WHERE ServiceType = 'XYZ'
-            """
-        ).fetchall()
-        keys.update(r["BaseLayerKey"] for r in xyz if r["BaseLayerKey"])
-
-        return keys
+        return frozenset(r[0] for r in rows)
 
     def _tab3_icon_catalogue(self):
         """
         Friendly label -> stored Glyph string.
         Stored value is written verbatim into PortalTreeNodes.Glyph.
         """
-        return [
-            ("(none)", ""),
-            ("Line Layer", "ea02@font-gis"),
-            ("Point Layer", "ea52@font-gis"),
-            ("Polygon Layer", "ea0a@font-gis"),
-            ("Map1", "ea53@font-gis"),
-            ("Map2", "x-fas fa-map"),
-            ("Horz. Bars", "x-fas fa-bars"),
-            ("Sun", "x-far fa-sun"),
-            ("Wrench", "x-fas fa-wrench"),
-        ]
+        return _TAB3_ICON_CATALOGUE
 
     def _tab3_init_icon_combo(self):
         if not hasattr(self, "cmbLayerIconType"):
@@ -3566,7 +3583,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
     def on_tab3_icon_combo_changed(self):
         """
         Persist selected icon to PortalTreeNodes.Glyph for the currently selected leaf node.
-        Keep the selection and details panel stable after updating.
+        The tree is not reloaded, so the selection and details panel stay as they are.
         """
         if not hasattr(self, "cmbLayerIconType"):
             return
@@ -3588,6 +3605,10 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._error("DB error", f"Failed to update icon:\n{exc}")
             return
 
+        # The tree items don't show the glyph, so there's nothing to rebuild;
+        # keep the cached node row in step for the details panel.
+        self._set_cached_tree_node_value(node_id, "Glyph", glyph)
+
         # Persist to defaults so it survives node deletion
         portal_id = self._get_current_portal_id()
         if portal_id is not None:
@@ -3599,41 +3620,6 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 self.db.save_portal_layer_defaults(portal_id, row["LayerKey"], None, glyph)
                 self.db.commit()
 
-        # Reload tree but keep selection + details stable
-        portal_id = self._get_current_portal_id()
-        if portal_id is None:
-            return
-
-        self._load_portal_tree(portal_id)
-
-        # Re-select the same node id (best effort)
-        try:
-            model = getattr(self, "_tree_model", None)
-            if model is None:
-                return
-
-            def _find_index_by_node_id(parent_item):
-                for r in range(parent_item.rowCount()):
-                    item0 = parent_item.child(r, 0)
-                    if item0 is None:
-                        continue
-                    if item0.data(QtCore.Qt.UserRole) == node_id:
-                        return item0.index()
-                    idx = _find_index_by_node_id(item0)
-                    if idx is not None:
-                        return idx
-                return None
-
-            root = model.invisibleRootItem()
-            idx = _find_index_by_node_id(root)
-            if idx is not None:
-                self.treePortalLayers.setCurrentIndex(idx)
-                # ensure UI details are repopulated immediately
-                self._on_tree_selection_changed()
-        except Exception:
-            # If reselect fails, user can click again, but DB is correct.
-            pass
-
     def _on_tree_selection_changed(self):
         """Helper to re-populate node details for the currently selected tree node."""
         if not hasattr(self, "treePortalLayers") or self._tree_model is None:
@@ -3678,6 +3664,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._populate_layer_details(row)
 
     def on_tree_selection_changed(self, selected, _deselected):
+        self._flush_pending_title_edits()
         indexes = selected.indexes()
         if not indexes:
             self._current_node_id = None
@@ -3703,12 +3690,8 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             self._clear_node_details()
             return
 
-        # Fetch full row for this node
-        cur = self.db.conn.execute(
-            "SELECT * FROM PortalTreeNodes WHERE PortalTreeNodeId = ?",
-            (node_id,),
-        )
-        row = cur.fetchone()
+        # Full row for this node, as loaded with the tree
+        row = self._tree_nodes_by_id.get(node_id)
         if row is None:
             self._clear_node_details()
             return
@@ -3742,6 +3725,9 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
         new_title = (item.text() or "").strip()
 
+        # This rename is newer than any panel edit still waiting in the queue
+        self._pending_title_edits.pop(("FolderTitle", node_id), None)
+
         # Update DB
         conn = self.db.conn
         conn.execute(
@@ -3749,6 +3735,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             (new_title, node_id),
         )
         conn.commit()
+        self._set_cached_tree_node_value(node_id, "FolderTitle", new_title)
 
         # If this node is currently selected, update the folder details panel
         if hasattr(self, "treePortalLayers") and hasattr(self, "txtFolderTitle"):
@@ -3921,6 +3908,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         Delete the selected node and all its descendants from the portal tree,
         after a confirmation dialog.
         """
+        self._flush_pending_title_edits()
         if not hasattr(self, "cmbPortalSelect") or not hasattr(
             self, "treePortalLayers"
         ):
@@ -3954,33 +3942,9 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
         conn = self.db.conn
 
-        # Save display title + glyph for any layer nodes in the subtree before deleting
-        cur = conn.execute(
-            """
-            WITH RECURSIVE to_delete AS (
-                SELECT PortalTreeNodeId
-                FROM PortalTreeNodes
-                WHERE PortalTreeNodeId = ?
-                UNION ALL
-                SELECT p.PortalTreeNodeId
-                FROM PortalTreeNodes p
-                JOIN to_delete td ON p.ParentNodeId = td.PortalTreeNodeId
-            )
-            SELECT LayerKey, LayerTitle, Glyph
-            FROM PortalTreeNodes
-            WHERE PortalTreeNodeId IN (SELECT PortalTreeNodeId FROM to_delete)
-              AND IsFolder = 0
-              AND LayerKey IS NOT NULL
-            """,
-            (node_id,),
-        )
-        for row in cur.fetchall():
-            self.db.save_portal_layer_defaults(
-                portal_id, row["LayerKey"], row["LayerTitle"], row["Glyph"]
-            )
-
-        # Recursive delete of the subtree using a CTE
-        conn.execute(
+        # Walk the subtree once; the same id list drives the defaults backup
+        # and the deletes below.
+        subtree = conn.execute(
             """
             WITH RECURSIVE to_delete AS (
                 SELECT PortalTreeNodeId
@@ -3994,10 +3958,28 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 JOIN to_delete td
                   ON p.ParentNodeId = td.PortalTreeNodeId
             )
-            DELETE FROM PortalTreeNodes
-            WHERE PortalTreeNodeId IN (SELECT PortalTreeNodeId FROM to_delete)
+            SELECT n.PortalTreeNodeId, n.IsFolder, n.LayerKey, n.LayerTitle, n.Glyph
+            FROM PortalTreeNodes n
+            JOIN to_delete td ON td.PortalTreeNodeId = n.PortalTreeNodeId
             """,
             (node_id,),
+        ).fetchall()
+
+        # Save display title + glyph for any layer nodes in the subtree before deleting
+        for row in subtree:
+            if row["IsFolder"] == 0 and row["LayerKey"] is not None:
+                self.db.save_portal_layer_defaults(
+                    portal_id, row["LayerKey"], row["LayerTitle"], row["Glyph"]
+                )
+
+        node_ids = [(row["PortalTreeNodeId"],) for row in subtree]
+        # foreign_keys is off on this connection, so PortalTreeNodeRoles'
+        # ON DELETE CASCADE never fires; clear role rows explicitly.
+        conn.executemany(
+            "DELETE FROM PortalTreeNodeRoles WHERE PortalTreeNodeId = ?", node_ids
+        )
+        conn.executemany(
+            "DELETE FROM PortalTreeNodes WHERE PortalTreeNodeId = ?", node_ids
         )
         conn.commit()
 
@@ -4284,6 +4266,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 (1 if checked else 0, node_id),
             )
             self.db.conn.commit()
+            self._set_cached_tree_node_value(node_id, "ExpandedDefault", 1 if checked else 0)
         except Exception as exc:
             self._error(
                 "Error saving folder", f"Failed to update ExpandedDefault:\n{exc}"
@@ -4303,6 +4286,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 (1 if checked else 0, node_id),
             )
             self.db.conn.commit()
+            self._set_cached_tree_node_value(node_id, "CheckedDefault", 1 if checked else 0)
         except Exception as exc:
             self._error(
                 "Error saving folder", f"Failed to update CheckedDefault:\n{exc}"
@@ -4323,6 +4307,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
                 (1 if checked else 0, node_id),
             )
             self.db.conn.commit()
+            self._set_cached_tree_node_value(node_id, "Excluded", 1 if checked else 0)
         except Exception as exc:
             self._error(
                 "Error saving folder", f"Failed to update Excluded:\n{exc}"
@@ -4354,20 +4339,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             return
 
         new_title = (self.txtFolderTitle.text() or "").strip()
-
-        try:
-            # Update DB
-            self.db.conn.execute(
-                "UPDATE PortalTreeNodes SET FolderTitle = ? WHERE PortalTreeNodeId = ?",
-                (new_title, node_id),
-            )
-            self.db.conn.commit()
-        except Exception as exc:
-            self._error(
-                "Error updating folder title",
-                f"Failed to save folder title:\n{exc}",
-            )
-            return
+        self._queue_title_edit("FolderTitle", node_id, new_title)
 
         # Update the selected tree item title
         index = self.treePortalLayers.currentIndex()
@@ -4377,7 +4349,14 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         model = self.treePortalLayers.model()
         item = model.itemFromIndex(index)
         if item:
-            item.setText(new_title)
+            # Display only: the queued edit is the single DB writer, so
+            # on_tree_item_changed must not save this title as well.
+            was_blocked = model.blockSignals(True)
+            try:
+                item.setText(new_title)
+            finally:
+                model.blockSignals(was_blocked)
+            self.treePortalLayers.viewport().update()
 
     def on_folder_id_edited(self):
         """
@@ -4392,18 +4371,7 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             return
 
         folder_id = (self.txtFolderId.text() or "").strip()
-
-        try:
-            self.db.conn.execute(
-                "UPDATE PortalTreeNodes SET FolderId = ? WHERE PortalTreeNodeId = ?",
-                (folder_id, node_id),
-            )
-            self.db.conn.commit()
-        except Exception as exc:
-            self._error(
-                "Error saving folder",
-                f"Failed to update FolderId:\n{exc}",
-            )
+        self._queue_title_edit("FolderId", node_id, folder_id)
 
     def on_layer_title_edited(self):
         """
@@ -4418,30 +4386,72 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
             return
 
         title = (self.txtLayerTitle.text() or "").strip()
+        self._queue_title_edit(
+            "LayerTitle", node_id, title, self._get_current_portal_id()
+        )
+
+    def _queue_title_edit(self, column, node_id, value, portal_id=None):
+        """
+        Queue a PortalTreeNodes FolderTitle / FolderId / LayerTitle write
+        and (re)start the save timer. A later edit of the same field on the
+        same node replaces the queued value.
+        """
+        self._pending_title_edits[(column, node_id)] = (value, portal_id)
+        self._title_save_timer.start()
+
+    def _flush_pending_title_edits(self):
+        """
+        Write all queued title edits in one transaction.
+
+        Called by the save timer, and before anything that reads the tree
+        back or drops the node (selection change, tree reload, delete,
+        closing the window).
+        """
+        self._title_save_timer.stop()
+        pending = self._pending_title_edits
+        if not pending:
+            return
+        self._pending_title_edits = {}
 
+        conn = self.db.conn
         try:
-            self.db.conn.execute(
-                "UPDATE PortalTreeNodes SET LayerTitle = ? WHERE PortalTreeNodeId = ?",
-                (title, node_id),
-            )
-            self.db.conn.commit()
+            for (column, node_id), (value, portal_id) in pending.items():
+                conn.execute(
+                    f"UPDATE PortalTreeNodes SET {column} = ? WHERE PortalTreeNodeId = ?",
+                    (value, node_id),
+                )
+
+                # Persist layer titles to defaults so they survive node deletion
+                if column != "LayerTitle" or portal_id is None:
+                    continue
+                row = conn.execute(
+                    "SELECT LayerKey FROM PortalTreeNodes WHERE PortalTreeNodeId = ?",
+                    (node_id,),
+                ).fetchone()
+                if row and row["LayerKey"]:
+                    self.db.save_portal_layer_defaults(portal_id, row["LayerKey"], value, None)
+            conn.commit()
         except Exception as exc:
+            conn.rollback()
             self._error(
-                "Error saving layer title",
-                f"Failed to update LayerTitle:\n{exc}",
+                "Error saving tree node",
+                f"Failed to save folder/layer title changes:\n{exc}",
             )
             return
 
-        # Persist to defaults so it survives node deletion
-        portal_id = self._get_current_portal_id()
-        if portal_id is not None:
-            row = self.db.conn.execute(
-                "SELECT LayerKey FROM PortalTreeNodes WHERE PortalTreeNodeId = ?",
-                (node_id,),
-            ).fetchone()
-            if row and row["LayerKey"]:
-                self.db.save_portal_layer_defaults(portal_id, row["LayerKey"], title, None)
-                self.db.commit()
+        for (column, node_id), (value, _portal_id) in pending.items():
+            self._set_cached_tree_node_value(node_id, column, value)
+
+    def _set_cached_tree_node_value(self, node_id, column, value):
+        """Mirror a committed PortalTreeNodes column update in _tree_nodes_by_id."""
+        node = self._tree_nodes_by_id.get(node_id)
+        if node is not None:
+            node[column] = value
+
+    def closeEvent(self, event):
+        if hasattr(self, "_title_save_timer"):
+            self._flush_pending_title_edits()
+        super().closeEvent(event)
 
     def _tab3_reselect_node_id(self, node_id: int):
         model = getattr(self, "_tree_model", None)
@@ -4646,29 +4656,21 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
 
     def _sync_portal_combo_from_tab2(self) -> None:
         """Sync Tab 3 combo to match Tab 2 combo."""
-        if not hasattr(self, "cmbPortalSelectLayers") or not hasattr(self, "cmbPortalSelect"):
-            return
-        src = self.cmbPortalSelectLayers
-        dst = self.cmbPortalSelect
-
-        idx = src.currentIndex()
-        if idx < 0 or idx >= dst.count():
-            return
-        if dst.currentIndex() == idx:
-            return
-
-        try:
-            dst.blockSignals(True)
-            dst.setCurrentIndex(idx)
-        finally:
-            dst.blockSignals(False)
+        self._sync_portal_combo("cmbPortalSelectLayers", "cmbPortalSelect")
 
     def _sync_portal_combo_from_tab3(self) -> None:
         """Sync Tab 2 combo to match Tab 3 combo."""
-        if not hasattr(self, "cmbPortalSelect") or not hasattr(self, "cmbPortalSelectLayers"):
+        self._sync_portal_combo("cmbPortalSelect", "cmbPortalSelectLayers")
+
+    def _sync_portal_combo(self, src_name: str, dst_name: str) -> None:
+        """
+        Set combo dst_name to combo src_name's index without firing dst's
+        currentIndexChanged, so the two portal combos don't recurse.
+        """
+        src = getattr(self, src_name, None)
+        dst = getattr(self, dst_name, None)
+        if src is None or dst is None:
             return
-        src = self.cmbPortalSelect
-        dst = self.cmbPortalSelectLayers
 
         idx = src.currentIndex()
         if idx < 0 or idx >= dst.count():
@@ -4676,11 +4678,11 @@ class MainWindowUIClass(QtWidgets.QMainWindow):
         if dst.currentIndex() == idx:
             return
 
+        was_blocked = dst.blockSignals(True)
         try:
-            dst.blockSignals(True)
             dst.setCurrentIndex(idx)
         finally:
-            dst.blockSignals(False)
+            dst.blockSignals(was_blocked)
 
     # ------------------------------------------------------------------
     # Saving: Tab1
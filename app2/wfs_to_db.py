@@ -66,6 +66,11 @@ _MAPSERVER_TYPE_MAP = {
     "annotation": "POINT",
 }
 
+# Parsed GetCapabilities documents, keyed by (capabilities URL, WFS version).
+# WFSToDB is created per request, so this lets repeated schema lookups skip
+# re-downloading and re-parsing the full capabilities document.
+_CAPABILITIES_CACHE = {}
+
 def mapserver_type_to_geometry(ms_type: str) -> str:
     return _MAPSERVER_TYPE_MAP.get((ms_type or "").lower(), "LINESTRING")
 
@@ -124,6 +129,34 @@ class WFSToDB:
         q.update({"service": "WFS", "request": "GetCapabilities", "version": self.wfs_version})
         return urlparse.urlunsplit((parts.scheme, parts.netloc, parts.path, urlparse.urlencode(q), parts.fragment))
 
+    def _get_wfs(self, refresh: bool = False):
+        """
+        OWSLib WebFeatureService for self.wfs_url, built from a capabilities
+        document fetched with our session/timeouts. Reuses the cached one
+        unless refresh=True.
+        """
+        url = self._capabilities_url()
+        key = (url, self.wfs_version)
+        wfs = None if refresh else _CAPABILITIES_CACHE.get(key)
+        if wfs is not None:
+            return wfs
+
+        r = self.session.get(
+            url,
+            timeout=(self.connect_timeout, self.timeout),
+            allow_redirects=True,
+        )
+        r.raise_for_status()
+
+        try:
+            from owslib.wfs import WebFeatureService
+        except ImportError as e:
+            raise RuntimeError("OWSLib is required (pip install owslib)") from e
+
+        wfs = WebFeatureService(url=self.wfs_url, version=self.wfs_version, xml=r.content)
+        _CAPABILITIES_CACHE[key] = wfs
+        return wfs
+
     def _clean_props(self, props: dict) -> dict:
         """
         Normalize property dict from OWSLib: drop geometry, normalize names/types.
@@ -155,25 +188,21 @@ class WFSToDB:
         if ":" not in typename:
             typename = f"ms:{typename}"
 
-        # Fetch capabilities with our session/timeouts and feed XML to OWSLib
-        url = self._capabilities_url()
-        r = self.session.get(
-            url,
-            timeout=(self.connect_timeout, self.timeout),
-            allow_redirects=True,
-        )
-        r.raise_for_status()
-
-        try:
-            from owslib.wfs import WebFeatureService
-        except ImportError as e:
-            raise RuntimeError("OWSLib is required (pip install owslib)") from e
-
-        wfs = WebFeatureService(url=self.wfs_url, version=self.wfs_version, xml=r.content)
+        # Capabilities fetched with our session/timeouts and fed to OWSLib,
+        # cached across calls
+        wfs = self._get_wfs()
 
+        # get_schema sends its own DescribeFeatureType request; the
+        # capabilities document doesn't affect the result
         schema = wfs.get_schema(typename)
 
         if schema is None:
+            # Refresh the capabilities so the "Available layers" hint includes
+            # layers added to the mapfile since the cache was filled
+            try:
+                wfs = self._get_wfs(refresh=True)
+            except Exception:
+                pass
             available = sorted(getattr(wfs, "contents", {}).keys())
             raise RuntimeError(
                 f"OWSLib returned no schema for '{typename}'. "
@@ -110,6 +110,86 @@ class DBAccess:
         )
         return list(cur.fetchall())
 
+    def get_all_layers_with_usage(self):
+        """
+        get_all_layers() with each layer's portal usage aggregated in SQL.
+
+        Returns one tuple per layer, in get_all_layers() order:
+          (MapServerLayerId, MapLayerName, BaseLayerKey,
+           IsXYZ, HasWms, HasWfs, PortalUsage)
+
+        PortalUsage is a {PortalKey: Status} dict of the portals the layer
+        is used in, ordered by PortalKey. Status is 'Switch', 'WMS+VECTOR',
+        'WMS' or 'VECTOR', with the same HasWms/HasWfs/HasSwitch rules as
+        get_layer_portal_usage(); portals where the layer is off are left
+        out.
+        """
+        cur = self.conn.execute(
+            """
+            WITH Usage AS (
+                SELECT
+                    m.BaseLayerKey,
+                    p.PortalKey,
+                    MAX(
+                        CASE
+                            WHEN s.ServiceType = 'WMS'
+                             AND pl.PortalLayerId IS NOT NULL
+                            THEN 1 ELSE 0
+                        END
+                    ) AS HasWms,
+                    MAX(
+                        CASE
+                            WHEN s.ServiceType = 'WFS'
+                             AND pl.PortalLayerId IS NOT NULL
+                            THEN 1 ELSE 0
+                        END
+                    ) AS HasWfs,
+                    MAX(
+                        CASE
+                            WHEN psl.PortalSwitchLayerId IS NOT NULL
+                            THEN 1 ELSE 0
+                        END
+                    ) AS HasSwitch
+                FROM MapServerLayers m
+                CROSS JOIN Portals p
+                LEFT JOIN ServiceLayers s
+                  ON s.MapServerLayerId = m.MapServerLayerId
+                LEFT JOIN PortalLayers pl
+                  ON pl.ServiceLayerId = s.ServiceLayerId
+                 AND pl.PortalId = p.PortalId
+                LEFT JOIN PortalSwitchLayerChildren c
+                  ON c.ServiceLayerId = s.ServiceLayerId
+                LEFT JOIN PortalSwitchLayers psl
+                  ON psl.PortalSwitchLayerId = c.PortalSwitchLayerId
+                 AND psl.PortalId = p.PortalId
+                GROUP BY
+                    m.BaseLayerKey,
+                    p.PortalId,
+                    p.PortalKey
+            )
+            SELECT
+                BaseLayerKey,
+                PortalKey,
+                CASE
+                    WHEN HasSwitch THEN 'Switch'
+                    WHEN HasWms AND HasWfs THEN 'WMS+VECTOR'
+                    WHEN HasWms THEN 'WMS'
+                    WHEN HasWfs THEN 'VECTOR'
+                END AS Status
+            FROM Usage
+            WHERE HasSwitch OR HasWms OR HasWfs
+            ORDER BY BaseLayerKey, PortalKey
+            """
+        )
+        usage_by_base = {}
+        for base_key, portal_key, status in cur:
+            usage_by_base.setdefault(base_key, {})[portal_key] = status
+
+        return [
+            (*tuple(layer), dict(usage_by_base.get(layer["BaseLayerKey"], ())))
+            for layer in self.get_all_layers()
+        ]
+
     def get_tab1_layer_list(self):
         """Return basic info for all MapServerLayers for the Tab 1 DB dropdown.
 
@@ -1006,6 +1086,31 @@ class DBAccess:
         )
         return list(cur.fetchall())
 
+    def get_wfs_service_layer_fields_by_name(self, mapserver_layer_id: int) -> dict:
+        """
+        WFS ServiceLayerFields for this layer keyed by FieldName, for Tab 1.
+
+        Each value is a row with:
+          FieldName, IncludeInPropertyname, IsTooltip, TooltipAlias
+
+        Rows come in FieldOrder/FieldName order, so a duplicated FieldName
+        keeps its last row (as a dict built from get_wfs_service_layer_fields
+        would).
+        """
+        cur = self.conn.execute(
+            """
+            SELECT f.FieldName, f.IncludeInPropertyname, f.IsTooltip, f.TooltipAlias
+            FROM ServiceLayerFields f
+            JOIN ServiceLayers s
+              ON s.ServiceLayerId = f.ServiceLayerId
+            WHERE s.MapServerLayerId = ?
+              AND UPPER(s.ServiceType) = 'WFS'
+            ORDER BY f.FieldOrder, f.FieldName
+            """,
+            (mapserver_layer_id,),
+        )
+        return {r[0]: r for r in cur}
+
     def get_service_layer_orderby(self, service_layer_id: int) -> list:
         """Return ServiceLayerOrderBy rows for a given WFS service layer, ordered by SortPosition."""
         cur = self.conn.execute(
@@ -1,7 +1,260 @@
 import os
 import json
 import sqlite3
-from typing import Dict, Any, List, Optional
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speed-up; stdlib json is the fallback
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+# ServiceLayers that belong to a portal, either directly via PortalLayers or
+# as children of one of its PortalSwitchLayers. Binds PortalId twice.
+_SQL_PORTAL_SERVICE_LAYER_IDS = """
+    WITH PortalServiceLayerIds AS (
+        -- Direct membership
+        SELECT pl.ServiceLayerId
+        FROM PortalLayers pl
+        WHERE pl.PortalId = ?
+
+        UNION
+
+        -- Switch children membership
+        SELECT c.ServiceLayerId
+        FROM PortalSwitchLayers psl
+        JOIN PortalSwitchLayerChildren c
+          ON c.PortalSwitchLayerId = psl.PortalSwitchLayerId
+        WHERE psl.PortalId = ?
+    )
+"""
+
+
+# Exporter queries, kept as module constants so the text is built once and
+# repeated exports hit the connection's prepared-statement cache.
+# Switch layers with their children in ChildOrder. LEFT JOINs keep switches
+# that have no children (LayerKey is NULL on their single row).
+_SQL_SWITCH_LAYERS = """
+    SELECT
+        psl.SwitchKey,
+        psl.VectorFeaturesMinScale,
+        sl.LayerKey
+    FROM PortalSwitchLayers psl
+    LEFT JOIN PortalSwitchLayerChildren pslc
+      ON pslc.PortalSwitchLayerId = psl.PortalSwitchLayerId
+    LEFT JOIN ServiceLayers sl
+      ON sl.ServiceLayerId = pslc.ServiceLayerId
+    WHERE psl.PortalId = ?
+    ORDER BY psl.PortalSwitchLayerId,
+             COALESCE(pslc.ChildOrder, 0),
+             pslc.PortalSwitchLayerChildId
+"""
+
+_SQL_PORTAL_SERVICE_LAYERS = _SQL_PORTAL_SERVICE_LAYER_IDS + """
+    SELECT
+        sl.ServiceLayerId,
+        sl.LayerKey,
+        UPPER(sl.ServiceType) AS ServiceType,
+        sl.FeatureType,
+        sl.IdPropertyName,
+        sl.GeomFieldName,
+        sl.GridXType,
+        sl.Grouping,
+        sl.WfsMaxScale,
+
+        m.MapServerLayerId,
+        m.MapLayerName,
+        m.BaseLayerKey,
+        m.GridXType AS MapGridXType,
+        m.GeometryType,
+        m.DefaultGeomFieldName,
+
+        m.Projection      AS MapProjection,
+        m.Opacity         AS MapOpacity,
+        m.LabelClassName  AS MapLabelClassName,
+        m.HasLabels       AS MapHasLabels,
+        m.HasGrid         AS MapHasGrid,
+        m.NoCluster       AS MapNoCluster,
+        m.Attribution     AS MapAttribution
+    FROM PortalServiceLayerIds pids
+    JOIN ServiceLayers sl
+      ON sl.ServiceLayerId = pids.ServiceLayerId
+    JOIN MapServerLayers m
+      ON m.MapServerLayerId = sl.MapServerLayerId
+    ORDER BY sl.LayerKey
+"""
+
+_SQL_PORTAL_ORDERBY = _SQL_PORTAL_SERVICE_LAYER_IDS + """
+    SELECT sl.MapServerLayerId, ob.FieldName, ob.Direction, ob.SortPosition
+    FROM ServiceLayerOrderBy ob
+    JOIN ServiceLayers sl ON sl.ServiceLayerId = ob.ServiceLayerId
+    WHERE sl.MapServerLayerId IN (
+        SELECT psl.MapServerLayerId
+        FROM PortalServiceLayerIds pids
+        JOIN ServiceLayers psl ON psl.ServiceLayerId = pids.ServiceLayerId
+    )
+    ORDER BY sl.MapServerLayerId, ob.SortPosition, ob.OrderById
+"""
+
+_SQL_PORTAL_SERVICE_FIELDS = _SQL_PORTAL_SERVICE_LAYER_IDS + """
+    SELECT
+        f.ServiceLayerId,
+        f.FieldName,
+        f.FieldType,
+        f.IncludeInPropertyname,
+        f.IsTooltip,
+        f.TooltipAlias,
+        f.FieldOrder
+    FROM ServiceLayerFields f
+    JOIN PortalServiceLayerIds pids
+      ON pids.ServiceLayerId = f.ServiceLayerId
+    ORDER BY f.ServiceLayerId, COALESCE(f.FieldOrder, 0), f.FieldName
+"""
+
+_SQL_PORTAL_MAPSERVER_STYLES = _SQL_PORTAL_SERVICE_LAYER_IDS + """
+    SELECT
+        s.MapServerLayerId,
+        s.GroupName   AS name,
+        s.StyleTitle  AS title,
+        s.IsIncluded
+    FROM MapServerLayerStyles s
+    WHERE s.MapServerLayerId IN (
+        SELECT sl.MapServerLayerId
+        FROM PortalServiceLayerIds pids
+        JOIN ServiceLayers sl ON sl.ServiceLayerId = pids.ServiceLayerId
+    )
+    ORDER BY s.MapServerLayerId, COALESCE(s.DisplayOrder, 0),
+             s.GroupName, s.StyleTitle
+"""
+
+# Unscoped versions of the three queries above, for batch exports that load
+# fields, styles and ORDERBY once for every portal. Same columns and order.
+_SQL_ALL_ORDERBY = """
+    SELECT sl.MapServerLayerId, ob.FieldName, ob.Direction, ob.SortPosition
+    FROM ServiceLayerOrderBy ob
+    JOIN ServiceLayers sl ON sl.ServiceLayerId = ob.ServiceLayerId
+    ORDER BY sl.MapServerLayerId, ob.SortPosition, ob.OrderById
+"""
+
+_SQL_ALL_SERVICE_FIELDS = """
+    SELECT
+        f.ServiceLayerId,
+        f.FieldName,
+        f.FieldType,
+        f.IncludeInPropertyname,
+        f.IsTooltip,
+        f.TooltipAlias,
+        f.FieldOrder
+    FROM ServiceLayerFields f
+    ORDER BY f.ServiceLayerId, COALESCE(f.FieldOrder, 0), f.FieldName
+"""
+
+_SQL_ALL_MAPSERVER_STYLES = """
+    SELECT
+        s.MapServerLayerId,
+        s.GroupName   AS name,
+        s.StyleTitle  AS title,
+        s.IsIncluded
+    FROM MapServerLayerStyles s
+    ORDER BY s.MapServerLayerId, COALESCE(s.DisplayOrder, 0),
+             s.GroupName, s.StyleTitle
+"""
+
+
+# json_group_array/json_object are built in from SQLite 3.38; older builds
+# use the separate batched field/style/ORDERBY queries above.
+_HAS_JSON_AGGREGATES = sqlite3.sqlite_version_info >= (3, 38, 0)
+
+# _SQL_PORTAL_SERVICE_LAYERS plus each layer's fields, included styles and
+# ORDERBY rows as JSON arrays, so the whole portal comes back in one query.
+# json_group_array element order is undefined, so each object carries its
+# sort columns and _load_portal_layer_data sorts the decoded lists the same
+# way as the batched loaders.
+_SQL_PORTAL_SERVICE_LAYERS_JSON = """
+    SELECT
+        svc.*,
+        (
+            SELECT json_group_array(json_object(
+                'FieldName', f.FieldName,
+                'FieldType', f.FieldType,
+                'IncludeInPropertyname', f.IncludeInPropertyname,
+                'IsTooltip', f.IsTooltip,
+                'TooltipAlias', f.TooltipAlias,
+                'FieldOrder', f.FieldOrder
+            ))
+            FROM ServiceLayerFields f
+            WHERE f.ServiceLayerId = svc.ServiceLayerId
+        ) AS FieldsJson,
+        (
+            SELECT json_group_array(json_object(
+                'name', st.GroupName,
+                'title', st.StyleTitle,
+                'DisplayOrder', st.DisplayOrder
+            ))
+            FROM MapServerLayerStyles st
+            WHERE st.MapServerLayerId = svc.MapServerLayerId
+              AND st.IsIncluded = 1
+        ) AS StylesJson,
+        (
+            SELECT json_group_array(json_object(
+                'FieldName', o.FieldName,
+                'Direction', o.Direction,
+                'SortPosition', o.SortPosition,
+                'OrderById', o.OrderById
+            ))
+            FROM ServiceLayerOrderBy o
+            JOIN ServiceLayers osl ON osl.ServiceLayerId = o.ServiceLayerId
+            WHERE osl.MapServerLayerId = svc.MapServerLayerId
+        ) AS OrderByJson
+    FROM (""" + _SQL_PORTAL_SERVICE_LAYERS + """) svc
+    ORDER BY svc.LayerKey
+"""
+
+
+def _prepare_connection(conn: sqlite3.Connection) -> None:
+    """
+    Read-side tuning for the exporter queries. All connection-scoped, so
+    safe to repeat on every export.
+
+    journal_mode/synchronous are deliberately left alone: the connection is
+    usually the app's shared one (self.db.conn), which also writes, and WAL
+    would persist into the checked-in MapMakerDB.db. query_only is only set
+    for the duration of _read_transaction.
+    """
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -65536")
+    conn.execute("PRAGMA mmap_size = 268435456")
+
+
+@contextmanager
+def _read_transaction(conn: sqlite3.Connection):
+    """
+    Run the block's exporter reads as one read transaction under
+    PRAGMA query_only, so they share a single snapshot and shared lock
+    instead of taking one per SELECT.
+
+    If the caller already has a transaction open (e.g. unsaved edits on the
+    app's shared connection) the reads join it and it is neither committed
+    nor rolled back here. query_only is restored to its previous value.
+    """
+    prev_query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    conn.execute("PRAGMA query_only = ON")
+    own_txn = not conn.in_transaction
+    if own_txn:
+        conn.execute("BEGIN")
+    try:
+        yield
+    finally:
+        if own_txn and conn.in_transaction:
+            conn.execute("COMMIT")
+        conn.execute(f"PRAGMA query_only = {int(prev_query_only)}")
 
 
 def _find_key_paths(obj, target_key: str, path: str = ""):
@@ -38,195 +291,97 @@ def _load_switch_layers(
             "childrenLayerKeys": [layerKey, ...]
         }
     """
-    # PortalSwitchLayers is per portal
-    cur = conn.execute(
-        """
-        SELECT
-            psl.PortalSwitchLayerId,
-            psl.SwitchKey,
-            psl.VectorFeaturesMinScale
-        FROM PortalSwitchLayers psl
-        WHERE psl.PortalId = ?
-        """,
-        (portal_id,),
-    )
-    switch_rows = cur.fetchall()
-
+    # PortalSwitchLayers is per portal; one row per child, in ChildOrder
     result: Dict[str, Dict[str, Any]] = {}
-    if not switch_rows:
-        return result
-
-    # Map switchId -> (switchKey, minScale)
-    switch_by_id = {
-        row[0]: {
-            "switchKey": row[1],
-            "vectorFeaturesMinScale": row[2],
-        }
-        for row in switch_rows
-    }
-
-    # Children
-    cur = conn.execute(
-        """
-        SELECT
-            pslc.PortalSwitchLayerId,
-            sl.LayerKey,
-            pslc.ChildOrder
-        FROM PortalSwitchLayerChildren pslc
-        JOIN ServiceLayers sl
-          ON sl.ServiceLayerId = pslc.ServiceLayerId
-        JOIN PortalSwitchLayers psl
-          ON psl.PortalSwitchLayerId = pslc.PortalSwitchLayerId
-        WHERE psl.PortalId = ?
-        """,
-        (portal_id,),
-    )
-    children_rows = cur.fetchall()
- 
-
-    # print("DEBUG _load_switch_layers switch_rows:", [(r[0], r[1]) for r in switch_rows])
-    # print("DEBUG _load_switch_layers children_rows:", children_rows[:10], "count:", len(children_rows))
-    # print("DEBUG _load_switch_layers types:",
-    #       "switch_ids:", [(type(r[0]), r[0]) for r in switch_rows],
-    #       "child_switch_ids:", [(type(r[0]), r[0]) for r in children_rows[:5]])
-
-
-    children_by_switch_id: Dict[int, List[str]] = {}
-    for switch_id, layer_key, child_order in children_rows:
-        children_by_switch_id.setdefault(switch_id, []).append((child_order, layer_key))
-
-    for switch_id, meta in switch_by_id.items():
-        children_pairs = children_by_switch_id.get(switch_id, [])
-        children_keys = [lk for _, lk in sorted(children_pairs, key=lambda x: x[0] or 0)]
-        result[meta["switchKey"]] = {
-            "vectorFeaturesMinScale": meta["vectorFeaturesMinScale"],
-            "childrenLayerKeys": children_keys,
-        }
-    
+    for switch_key, min_scale, layer_key in conn.execute(_SQL_SWITCH_LAYERS, (portal_id,)):
+        sw = result.get(switch_key)
+        if sw is None:
+            sw = result[switch_key] = {
+                "vectorFeaturesMinScale": min_scale,
+                "childrenLayerKeys": [],
+            }
+        if layer_key is not None:
+            sw["childrenLayerKeys"].append(sys.intern(layer_key))
     return result
 
 def _load_portal_service_layers(
     conn: sqlite3.Connection, portal_id: int
-) -> List[Dict[str, Any]]:
+) -> List[sqlite3.Row]:
     """
-    Returns a list of dicts for all ServiceLayers that belong to this portal,
+    Returns sqlite3.Row objects for all ServiceLayers that belong to this portal,
     either:
       - directly via PortalLayers, or
       - indirectly as children of PortalSwitchLayers via PortalSwitchLayerChildren
 
     Joined with MapServerLayers.
     """
-    cur = conn.execute(
-        """
-        WITH PortalServiceLayerIds AS (
-            -- Direct membership
-            SELECT pl.ServiceLayerId
-            FROM PortalLayers pl
-            WHERE pl.PortalId = ?
-
-            UNION
-
-            -- Switch children membership
-            SELECT c.ServiceLayerId
-            FROM PortalSwitchLayers psl
-            JOIN PortalSwitchLayerChildren c
-              ON c.PortalSwitchLayerId = psl.PortalSwitchLayerId
-            WHERE psl.PortalId = ?
-        )
-        SELECT
-            sl.ServiceLayerId,
-            sl.LayerKey,
-            sl.ServiceType,
-            sl.FeatureType,
-            sl.IdPropertyName,
-            sl.GeomFieldName,
-            sl.GridXType,
-            sl.Grouping,
-            sl.WfsMaxScale,
-
-            m.MapServerLayerId,
-            m.MapLayerName,
-            m.BaseLayerKey,
-            m.GridXType AS MapGridXType,
-            m.GeometryType,
-            m.DefaultGeomFieldName,
-
-            m.Projection      AS MapProjection,
-            m.Opacity         AS MapOpacity,
-            m.LabelClassName  AS MapLabelClassName,
-            m.HasLabels       AS MapHasLabels,
-            m.HasGrid         AS MapHasGrid,
-            m.NoCluster       AS MapNoCluster,
-            m.Attribution     AS MapAttribution
-        FROM PortalServiceLayerIds pids
-        JOIN ServiceLayers sl
-          ON sl.ServiceLayerId = pids.ServiceLayerId
-        JOIN MapServerLayers m
-          ON m.MapServerLayerId = sl.MapServerLayerId
-        ORDER BY sl.LayerKey
-        """,
-        (portal_id, portal_id),
-    )
+    cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
+    cur.execute(_SQL_PORTAL_SERVICE_LAYERS, (portal_id, portal_id))
 
-    rows: List[Dict[str, Any]] = []
-    cols = [d[0] for d in cur.description]
-    for r in cur.fetchall():
-        rows.append(dict(zip(cols, r)))
-    return rows
+    return cur.fetchall()
 
-def _load_service_orderby(
-    conn: sqlite3.Connection, mapserver_layer_id: int
-) -> List[Dict[str, Any]]:
+def _load_portal_service_layers_json(
+    conn: sqlite3.Connection, portal_id: int
+) -> List[sqlite3.Row]:
     """
-    ServiceLayerOrderBy for a layer, looked up by MapServerLayerId so both
-    WMS and WFS entries share the same ORDERBY config.
-    Returns rows ordered by SortPosition.
+    As _load_portal_service_layers, with FieldsJson / StylesJson /
+    OrderByJson columns carrying each layer's child rows.
     """
-    cur = conn.execute(
-        """
-        SELECT ob.FieldName, ob.Direction, ob.SortPosition
-        FROM ServiceLayerOrderBy ob
-        JOIN ServiceLayers sl ON sl.ServiceLayerId = ob.ServiceLayerId
-        WHERE sl.MapServerLayerId = ?
-        ORDER BY ob.SortPosition, ob.OrderById
-        """,
-        (mapserver_layer_id,),
-    )
-    cols = [d[0] for d in cur.description]
-    return [dict(zip(cols, r)) for r in cur.fetchall()]
+    cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
+    cur.execute(_SQL_PORTAL_SERVICE_LAYERS_JSON, (portal_id, portal_id))
+    return cur.fetchall()
+
+def _load_portal_orderby(
+    conn: sqlite3.Connection, portal_id: Optional[int]
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    ServiceLayerOrderBy for every layer in the portal (every layer in the
+    DB if portal_id is None), in one query.
 
-def _load_service_fields(
-    conn: sqlite3.Connection, service_layer_id: int
-) -> List[Dict[str, Any]]:
+    Keyed by MapServerLayerId so both WMS and WFS entries share the same
+    ORDERBY config. Each list is ordered by SortPosition.
     """
-    ServiceLayerFields: per-service propertynames & tooltips.
+    if portal_id is None:
+        cur = conn.execute(_SQL_ALL_ORDERBY)
+    else:
+        cur = conn.execute(_SQL_PORTAL_ORDERBY, (portal_id, portal_id))
+    by_mapserver_layer: Dict[int, List[Dict[str, Any]]] = {}
+    for ms_id, field_name, direction, sort_position in cur.fetchall():
+        by_mapserver_layer.setdefault(ms_id, []).append({
+            "FieldName": field_name,
+            "Direction": direction,
+            "SortPosition": sort_position,
+        })
+    return by_mapserver_layer
+
+def _load_portal_service_fields(
+    conn: sqlite3.Connection, portal_id: Optional[int]
+) -> Dict[int, List[sqlite3.Row]]:
     """
-    cur = conn.execute(
-        """
-        SELECT
-            FieldName,
-            FieldType,
-            IncludeInPropertyname,
-            IsTooltip,
-            TooltipAlias,
-            FieldOrder
-        FROM ServiceLayerFields
-        WHERE ServiceLayerId = ?
-        ORDER BY COALESCE(FieldOrder, 0), FieldName
-        """,
-        (service_layer_id,),
-    )
-    rows = []
-    cols = [d[0] for d in cur.description]
+    ServiceLayerFields (per-service propertynames & tooltips) for every
+    layer in the portal (every layer in the DB if portal_id is None), in
+    one query. Keyed by ServiceLayerId.
+    """
+    cur = conn.cursor()
+    cur.row_factory = sqlite3.Row
+    if portal_id is None:
+        cur.execute(_SQL_ALL_SERVICE_FIELDS)
+    else:
+        cur.execute(_SQL_PORTAL_SERVICE_FIELDS, (portal_id, portal_id))
+    by_service_layer: Dict[int, List[sqlite3.Row]] = {}
     for r in cur.fetchall():
-        rows.append(dict(zip(cols, r)))
-    return rows
+        by_service_layer.setdefault(r["ServiceLayerId"], []).append(r)
+    return by_service_layer
 
-def _load_mapserver_styles(
-    conn: sqlite3.Connection, mapserver_layer_id: int
-) -> List[Dict[str, Any]]:
+def _load_portal_mapserver_styles(
+    conn: sqlite3.Connection, portal_id: Optional[int]
+) -> Dict[int, List[Dict[str, Any]]]:
     """
-    MapServerLayerStyles: canonical per-layer style list.
+    MapServerLayerStyles: canonical per-layer style list for every layer in
+    the portal (every layer in the DB if portal_id is None), in one query.
+    Keyed by MapServerLayerId.
 
     MapServerLayerStyles schema (as per Tab 1):
       GroupName    -> style "name"
@@ -234,178 +389,328 @@ def _load_mapserver_styles(
       IsIncluded   -> included flag
       DisplayOrder -> ordering
     """
-    cur = conn.execute(
-        """
-        SELECT
-            GroupName   AS name,
-            StyleTitle  AS title,
-            IsIncluded,
-            DisplayOrder
-        FROM MapServerLayerStyles
-        WHERE MapServerLayerId = ?
-        ORDER BY COALESCE(DisplayOrder, 0), GroupName, StyleTitle
-        """,
-        (mapserver_layer_id,),
-    )
-
-    rows = []
-    cols = [d[0] for d in cur.description]
-    for r in cur.fetchall():
-        d = dict(zip(cols, r))
-        if int(d.get("IsIncluded") or 0) != 1:
+    if portal_id is None:
+        cur = conn.execute(_SQL_ALL_MAPSERVER_STYLES)
+    else:
+        cur = conn.execute(_SQL_PORTAL_MAPSERVER_STYLES, (portal_id, portal_id))
+    by_mapserver_layer: Dict[int, List[Dict[str, Any]]] = {}
+    for ms_id, name, title, is_included in cur.fetchall():
+        if int(is_included or 0) != 1:
             continue
         # keep only name/title in the exported model
-        rows.append({"name": d.get("name"), "title": d.get("title")})
-    return rows
+        by_mapserver_layer.setdefault(ms_id, []).append({"name": name, "title": title})
+    return by_mapserver_layer
+
+@lru_cache(maxsize=4)
+def _load_xyz_layers_cached(path: str, mtime: float) -> tuple:
+    """
+    Parse and filter xyz_layers.json once per (path, mtime); editing the
+    file changes mtime and so forces a re-read.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+
+    layers = doc.get("layers") or []
+    # Keep only xyz entries, ignore anything else if file grows later
+    return tuple(
+        l for l in layers
+        if isinstance(l, dict) and (l.get("layerType") or "").lower() == "xyz"
+    )
 
 def _load_xyz_layers_from_file() -> List[Dict[str, Any]]:
     """
     Load canonical XYZ layer entries from xyz_layers.json.
     Expected shape:
       { "layers": [ {layerType:"xyz", layerKey:..., ...}, ... ] }
+
+    The entry dicts are cached and shared between exports - treat them as
+    read-only.
     """
     # layer_export.py lives in json_generator/, xyz_layers.json should sit beside it
     here = os.path.dirname(os.path.abspath(__file__))
     path = os.path.join(here, "xyz_layers.json")
+    return list(_load_xyz_layers_cached(path, os.stat(path).st_mtime))
 
-    with open(path, "r", encoding="utf-8") as f:
-        doc = json.load(f)
-
-    layers = doc.get("layers") or []
-    # Keep only xyz entries, ignore anything else if file grows later
-    out = []
-    for l in layers:
-        if isinstance(l, dict) and (l.get("layerType") or "").lower() == "xyz":
-            out.append(l)
-    return out
-
-def _inject_xyz_layers(layers_out: List[Dict[str, Any]]) -> None:
+def _iter_new_xyz_layers(existing_keys: set):
     """
-    Append canonical XYZ layers, skipping duplicates by layerKey.
-    Mutates layers_out.
+    Yield canonical XYZ layers whose layerKey isn't in existing_keys.
+    Mutates existing_keys.
     """
-    existing_keys = {l.get("layerKey") for l in layers_out if isinstance(l, dict)}
     for xyz in _load_xyz_layers_from_file():
         k = xyz.get("layerKey")
         if k and k not in existing_keys:
-            layers_out.append(xyz)
             existing_keys.add(k)
+            yield xyz
 
-def build_portal_layer_model(
-    conn: sqlite3.Connection, portal_key: str
-) -> Dict[str, Any]:
+def _inject_xyz_layers(layers_out: List[Dict[str, Any]]) -> None:
     """
-    Canonical in-memory model for all layers in a portal.
-    Structure:
-      {
-        "portalKey": ...,
-        "layers": { layerKey -> layerInfo },
-        "switchLayers": { switchKey -> switchInfo }
-      }
+    Append canonical XYZ layers, skipping duplicates by layerKey.
+    Mutates layers_out.
     """
-    portal_id = _get_portal_id(conn, portal_key)
-    svc_rows = _load_portal_service_layers(conn, portal_id)
-    #print("DEBUG svc_rows contains FWDLINES_WMS:", any(r.get("LayerKey") == "FWDLINES_WMS" for r in svc_rows))
-    switch_map = _load_switch_layers(conn, portal_id)
+    existing_keys = {l.get("layerKey") for l in layers_out if isinstance(l, dict)}
+    layers_out.extend(_iter_new_xyz_layers(existing_keys))
 
-    layers: Dict[str, Any] = {}
+@lru_cache(maxsize=1024)
+def _parse_json_cached(text: str) -> Any:
+    """
+    Parse a JSON column value, memoized on the raw text so repeated values
+    (e.g. the same Grouping on every layer of a group) are parsed once.
+    Only objects/arrays are parsed; anything else, or invalid JSON, is
+    returned as the raw string so it stays visible in the export.
 
-    for row in svc_rows:
-        layer_key = row["LayerKey"]
-        service_layer_id = row["ServiceLayerId"]
+    The parsed object is shared between callers - treat it as read-only.
+    """
+    if text.lstrip()[:1] not in ("{", "["):
+        return text
+    try:
+        return _json_loads(text)
+    except ValueError:  # json and orjson decode errors both subclass it
+        return text
+
+def _sql_order_key(*values) -> tuple:
+    """
+    Sort key matching SQLite's ORDER BY for the given column values:
+    NULLs first, then by value.
+    """
+    return tuple((v is not None, v) for v in values)
+
+def _decode_ordered_fields(text: str) -> List[Dict[str, Any]]:
+    """FieldsJson in _SQL_PORTAL_SERVICE_FIELDS order."""
+    fields = _json_loads(text)
+    fields.sort(key=lambda f: _sql_order_key(
+        0 if f["FieldOrder"] is None else f["FieldOrder"], f["FieldName"]
+    ))
+    return fields
+
+def _decode_ordered_styles(text: str) -> List[Dict[str, Any]]:
+    """StylesJson in _SQL_PORTAL_MAPSERVER_STYLES order, name/title only."""
+    styles = _json_loads(text)
+    styles.sort(key=lambda s: _sql_order_key(
+        0 if s["DisplayOrder"] is None else s["DisplayOrder"], s["name"], s["title"]
+    ))
+    return [{"name": s["name"], "title": s["title"]} for s in styles]
+
+def _decode_ordered_orderby(text: str) -> List[Dict[str, Any]]:
+    """OrderByJson in _SQL_PORTAL_ORDERBY order, with its three columns."""
+    rows = _json_loads(text)
+    rows.sort(key=lambda o: _sql_order_key(o["SortPosition"], o["OrderById"]))
+    return [
+        {
+            "FieldName": o["FieldName"],
+            "Direction": o["Direction"],
+            "SortPosition": o["SortPosition"],
+        }
+        for o in rows
+    ]
 
-        default_geom_field = row["DefaultGeomFieldName"] or "msGeometry"
+def _load_shared_layer_data(conn: sqlite3.Connection):
+    """
+    Fields, included styles and ORDERBY for every layer in the DB, for
+    exporting several portals: (fields_by_sl, styles_by_ms, orderby_by_ms),
+    keyed like the portal-scoped loaders. None of it depends on the portal,
+    so it is read once instead of once per portal.
+    """
+    return (
+        _load_portal_service_fields(conn, None),
+        _load_portal_mapserver_styles(conn, None),
+        _load_portal_orderby(conn, None),
+    )
 
-        label_class = (row.get("MapLabelClassName") or "").strip()
-        if not label_class:
-            label_class = "labels"
+def _load_portal_layer_data(
+    conn: sqlite3.Connection,
+    portal_key: str,
+    portal_id: Optional[int],
+    shared=None,
+):
+    """
+    Run the portal-scoped loader queries shared by the model and the fused
+    document builder: one query for the layers with their fields, styles
+    and ORDERBY as JSON arrays (or three batched queries on SQLite < 3.38),
+    plus the switch layers.
 
-        has_labels = bool(row.get("MapHasLabels", 1))
-        has_grid = bool(row.get("MapHasGrid", 1))
+    With shared (from _load_shared_layer_data) only the portal's layers and
+    switch layers are queried.
 
-        projection = row["MapProjection"]
-        layer_opacity = row["MapOpacity"] if row["MapOpacity"] is not None else 0.90
+    Returns (svc_rows, switch_map, fields_by_sl, styles_by_ms, orderby_by_ms).
+    """
+    if portal_id is None:
+        portal_id = _get_portal_id(conn, portal_key)
+    # Parsed JSON is shared by reference in the model; don't let it outlive
+    # a single build in case a caller mutates the returned document.
+    _parse_json_cached.cache_clear()
+    if shared is not None:
+        fields_by_sl, styles_by_ms, orderby_by_ms = shared
+        return (
+            _load_portal_service_layers(conn, portal_id),
+            _load_switch_layers(conn, portal_id),
+            fields_by_sl,
+            styles_by_ms,
+            orderby_by_ms,
+        )
+    if not _HAS_JSON_AGGREGATES:
+        return (
+            _load_portal_service_layers(conn, portal_id),
+            _load_switch_layers(conn, portal_id),
+            _load_portal_service_fields(conn, portal_id),
+            _load_portal_mapserver_styles(conn, portal_id),
+            _load_portal_orderby(conn, portal_id),
+        )
 
-        no_cluster = row.get("MapNoCluster")
-        if no_cluster is None:
-            no_cluster = 1
-        no_cluster = bool(int(no_cluster))
+    svc_rows = _load_portal_service_layers_json(conn, portal_id)
+    fields_by_sl: Dict[int, List[Dict[str, Any]]] = {}
+    styles_by_ms: Dict[int, List[Dict[str, Any]]] = {}
+    orderby_by_ms: Dict[int, List[Dict[str, Any]]] = {}
+    for row in svc_rows:
+        fields_by_sl[row["ServiceLayerId"]] = _decode_ordered_fields(row["FieldsJson"])
+        ms_id = row["MapServerLayerId"]
+        if ms_id not in styles_by_ms:
+            styles_by_ms[ms_id] = _decode_ordered_styles(row["StylesJson"])
+            orderby_by_ms[ms_id] = _decode_ordered_orderby(row["OrderByJson"])
+    return (
+        svc_rows,
+        _load_switch_layers(conn, portal_id),
+        fields_by_sl,
+        styles_by_ms,
+        orderby_by_ms,
+    )
 
-        wfs_max_scale = row.get("WfsMaxScale")
+def _intern(value):
+    """
+    sys.intern enum-like text columns (ServiceType, GeometryType, GridXType)
+    so the few distinct values are shared across rows and portals and
+    compare by identity. Non-str values (NULL) pass through.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
 
-        # Fields
-        service_fields = _load_service_fields(conn, service_layer_id)
-        order_by_rows = _load_service_orderby(conn, row["MapServerLayerId"])
-        property_names = [
-            f["FieldName"]
-            for f in service_fields
-            if f.get("IncludeInPropertyname")
-        ]
-        tooltips = [
-            {
-                "field": f["FieldName"],
-                "alias": f.get("TooltipAlias") or f["FieldName"],
-            }
-            for f in service_fields
-            if f.get("IsTooltip")
+def _layer_info_from_row(
+    row: sqlite3.Row,
+    fields_by_sl: Dict[int, List[sqlite3.Row]],
+    styles_by_ms: Dict[int, List[Dict[str, Any]]],
+    orderby_by_ms: Dict[int, List[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Canonical layerInfo for one row of _load_portal_service_layers.
+    """
+    # Interned: layerKeys are looked up against switch children and reused as
+    # dict keys, so matching keys compare by identity.
+    layer_key = sys.intern(row["LayerKey"])
+    service_layer_id = row["ServiceLayerId"]
+
+    default_geom_field = row["DefaultGeomFieldName"] or "msGeometry"
+
+    label_class = (row["MapLabelClassName"] or "").strip()
+    if not label_class:
+        label_class = "labels"
+
+    has_labels = bool(row["MapHasLabels"])
+    has_grid = bool(row["MapHasGrid"])
+
+    projection = row["MapProjection"]
+    layer_opacity = row["MapOpacity"]
+    if layer_opacity is None:
+        layer_opacity = 0.90
+
+    no_cluster = row["MapNoCluster"]
+    if no_cluster is None:
+        no_cluster = 1
+    no_cluster = bool(int(no_cluster))
+
+    wfs_max_scale = row["WfsMaxScale"]
+
+    mapserver_layer_id = row["MapServerLayerId"]
+
+    # Fields: propertynames and tooltips in one pass
+    order_by_rows = orderby_by_ms.get(mapserver_layer_id, [])
+    property_names = []
+    tooltips = []
+    for f in fields_by_sl.get(service_layer_id, ()):
+        field_name = f["FieldName"]
+        if f["IncludeInPropertyname"]:
+            property_names.append(field_name)
+        if f["IsTooltip"]:
+            tooltips.append({
+                "field": field_name,
+                "alias": f["TooltipAlias"] or field_name,
+            })
+    # If IdPropertyName is NULL, exporter can fall back to first property or MapServerLayerFields later.
+    id_prop = row["IdPropertyName"]
+
+    # Styles (canonical per layer)
+    layer_styles = styles_by_ms.get(mapserver_layer_id, ())
+
+    # ServiceType is already upper-cased by _SQL_PORTAL_SERVICE_LAYERS
+    service_type = sys.intern(row["ServiceType"])
+    # For WFS, attach labelRule only if this layer has labels
+    label_rule = label_class if service_type == "WFS" and has_labels else None
+
+    name_titles = [
+        ((s.get("name") or "").strip(), (s.get("title") or "").strip())
+        for s in layer_styles
+    ]
+    if label_rule is not None:
+        styles = [
+            {"name": name, "title": title, "labelRule": label_rule}
+            for name, title in name_titles
         ]
-        # If IdPropertyName is NULL, exporter can fall back to first property or MapServerLayerFields later.
-        id_prop = row["IdPropertyName"]
+    else:
+        styles = [{"name": name, "title": title} for name, title in name_titles]
 
-        # Styles (canonical per layer)
-        layer_styles = _load_mapserver_styles(conn, row["MapServerLayerId"])
+    # Parse grouping JSON if present
+    raw_grouping = row["Grouping"]
+    grouping = _parse_json_cached(raw_grouping) if raw_grouping else None
 
-        styles = []
-        for s in layer_styles:
-            style_entry: Dict[str, Any] = {
-                "name": (s.get("name") or "").strip(),
-                "title": (s.get("title") or "").strip(),
-            }
+    return {
+        "layerKey": layer_key,
+        "serviceType": service_type,
+        "mapLayerName": row["MapLayerName"],
+        "geometryType": _intern(row["GeometryType"]),
+        "gridXType": _intern(row["GridXType"] or row["MapGridXType"]),
+        "defaults": {
+            "geomFieldName": default_geom_field
+        },
+        "overrides": {
+            "labelClassName": label_class,
+            "hasLabels": has_labels,
+            "hasGrid": has_grid,
+            "projection": projection,
+            "opacity": layer_opacity,
+            "noCluster": no_cluster,
+            "wfsMaxScale": wfs_max_scale,
+        },
+        "fields": {
+            "idProperty": id_prop,
+            "propertyNames": property_names,
+            "tooltips": tooltips,
+            "orderBy": order_by_rows,
+        },
+        "styles": styles,
+        "grouping": grouping,
+        "attribution": row["MapAttribution"] or None,
+    }
 
-            # For WFS, attach labelRule only if this layer has labels
-            if row["ServiceType"].upper() == "WFS" and has_labels:
-                style_entry["labelRule"] = label_class
+def build_portal_layer_model(
+    conn: sqlite3.Connection, portal_key: str, portal_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Canonical in-memory model for all layers in a portal.
+    Structure:
+      {
+        "portalKey": ...,
+        "layers": { layerKey -> layerInfo },
+        "switchLayers": { switchKey -> switchInfo }
+      }
 
-            styles.append(style_entry)
+    Callers that already hold the PortalId (e.g. looping over Portals) can
+    pass it to skip the PortalKey lookup.
+    """
+    svc_rows, switch_map, fields_by_sl, styles_by_ms, orderby_by_ms = (
+        _load_portal_layer_data(conn, portal_key, portal_id)
+    )
 
-        # Parse grouping JSON if present
-        grouping = None
-        raw_grouping = row["Grouping"]
-        if raw_grouping:
-            try:
-                grouping = json.loads(raw_grouping)
-            except Exception:
-                # If it isn't valid JSON, keep the raw value so at least it's visible
-                grouping = raw_grouping
-
-        layers[layer_key] = {
-            "layerKey": layer_key,
-            "serviceType": row["ServiceType"].upper(),
-            "mapLayerName": row["MapLayerName"],
-            "geometryType": row["GeometryType"],
-            "gridXType": row["GridXType"] or row["MapGridXType"],
-            "defaults": {
-                "geomFieldName": default_geom_field
-            },
-            "overrides": {
-                "labelClassName": label_class,
-                "hasLabels": has_labels,
-                "hasGrid": has_grid,
-                "projection": projection,
-                "opacity": layer_opacity,
-                "noCluster": no_cluster,
-                "wfsMaxScale": wfs_max_scale,
-            },
-            "fields": {
-                "idProperty": id_prop,
-                "propertyNames": property_names,
-                "tooltips": tooltips,
-                "orderBy": order_by_rows,
-            },
-            "styles": styles,
-            "grouping": grouping,
-            "attribution": row.get("MapAttribution") or None,
-        }
+    layers: Dict[str, Any] = {}
+    for row in svc_rows:
+        layer = _layer_info_from_row(row, fields_by_sl, styles_by_ms, orderby_by_ms)
+        layers[layer["layerKey"]] = layer
 
     return {
         "portalKey": portal_key,
@@ -413,6 +718,59 @@ def build_portal_layer_model(
         "switchLayers": switch_map,
     }
 
+# Static copy of the main PMS default.json defaults (see _build_defaults_block).
+# Shared by every export; never mutate it.
+_DEFAULTS_BLOCK: Dict[str, Any] = {
+    "styleSwitcherBelowNode": True,
+    "wms": {
+        "dateFormat": "Y-m-d",
+        "url": "/mapserver2/?",
+        "featureInfoWindow": True,
+        "hasMetadata": True,
+        "isBaseLayer": False,
+        "requestMethod": "POST",
+        "openLayers": {
+            "maxResolution": 1222.99245234375,
+            "opacity": 0.9,
+            "projection": "EPSG:2157",
+            "visibility": False,
+            "singleTile": True,
+        },
+    },
+    "wfs": {
+        "url": "/mapserver2/?",
+        "noCluster": True,
+        "serverOptions": {
+            "version": "2.0.0",
+            "maxResolution": 1222.99245234375,
+        },
+        "openLayers": {
+            "visibility": False,
+            "projection": "EPSG:2157",
+            "opacity": 0.9,
+        },
+    },
+    "xyz": {
+        "openLayers": {
+            "projection": "EPSG:2157",
+            "transitionEffect": "resize",
+            "visibility": False,
+        },
+        "isBaseLayer": True,
+    },
+    "switchlayer": {
+        "vectorFeaturesMinScale": 20000,
+        "visibility": False,
+        "featureInfoWindow": True,
+    },
+    "arcgisrest": {
+        "openLayers": {
+            "singleTile": False,
+            "visibility": False,
+        },
+    },
+}
+
 def _build_defaults_block(portal_key: str) -> Dict[str, Any]:
     """
     Return the 'defaults' block for the layer JSON document.
@@ -420,57 +778,11 @@ def _build_defaults_block(portal_key: str) -> Dict[str, Any]:
     For now, this is a static copy of the main PMS default.json defaults,
     reused for all portals. Later we can move this into LayerConfig_v3 (maybe).
     (e.g. per-portal defaults tables).
+
+    Every export shares the same _DEFAULTS_BLOCK dict, so treat it as
+    read-only.
     """
-    return {
-        "styleSwitcherBelowNode": True,
-        "wms": {
-            "dateFormat": "Y-m-d",
-            "url": "/mapserver2/?",
-            "featureInfoWindow": True,
-            "hasMetadata": True,
-            "isBaseLayer": False,
-            "requestMethod": "POST",
-            "openLayers": {
-                "maxResolution": 1222.99245234375,
-                "opacity": 0.9,
-                "projection": "EPSG:2157",
-                "visibility": False,
-                "singleTile": True,
-            },
-        },
-        "wfs": {
-            "url": "/mapserver2/?",
-            "noCluster": True,
-            "serverOptions": {
-                "version": "2.0.0",
-                "maxResolution": 1222.99245234375,
-            },
-            "openLayers": {
-                "visibility": False,
-                "projection": "EPSG:2157",
-                "opacity": 0.9,
-            },
-        },
-        "xyz": {
-            "openLayers": {
-                "projection": "EPSG:2157",
-                "transitionEffect": "resize",
-                "visibility": False,
-            },
-            "isBaseLayer": True,
-        },
-        "switchlayer": {
-            "vectorFeaturesMinScale": 20000,
-            "visibility": False,
-            "featureInfoWindow": True,
-        },
-        "arcgisrest": {
-            "openLayers": {
-                "singleTile": False,
-                "visibility": False,
-            },
-        },
-    }
+    return _DEFAULTS_BLOCK
 
 def build_layer_json_document(model: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -488,29 +800,28 @@ def build_layer_json_document(model: Dict[str, Any]) -> Dict[str, Any]:
     """
     portal_key = model.get("portalKey")
     defaults = _build_defaults_block(portal_key or "")
+    dflt = _precompute_default_slices(defaults)
 
     layers_out: List[Dict[str, Any]] = []
 
     # 1) Collect all child layerKeys that participate in a switchlayer
-    switched_children: set[str] = set()
-    for sw in model.get("switchLayers", {}).values():
-        for child_key in sw.get("childrenLayerKeys") or []:
-            if child_key:
-                switched_children.add(child_key)
-
-    # 2) Emit WMS / WFS layers, skipping any that are switch children
-    for layer_key, layer in model.get("layers", {}).items():
-        service_type = (layer.get("serviceType") or "").upper()
-
-        if layer_key in switched_children:
-            # This layer is represented via a switchlayer in this portal.
-            # Do not emit it as a standalone WMS/WFS.
-            continue
+    switched_children = _switch_child_keys(model.get("switchLayers", {}))
+
+    # 2) Emit WMS / WFS layers, skipping any that are switch children.
+    # A switch child is represented only via its switchlayer in this portal,
+    # so it is filtered out before anything is read from it.
+    standalone_items = [
+        (layer_key, layer)
+        for layer_key, layer in model.get("layers", {}).items()
+        if layer_key not in switched_children
+    ]
+    for layer_key, layer in standalone_items:
+        service_type = layer["serviceType"]  # already upper-cased in the model
 
         if service_type == "WMS":
-            layers_out.append(_build_wms_layer_entry(layer_key, layer, defaults))
+            layers_out.append(_build_wms_layer_entry(layer_key, layer, dflt))
         elif service_type == "WFS":
-            layers_out.append(_build_wfs_layer_entry(layer_key, layer, defaults))
+            layers_out.append(_build_wfs_layer_entry(layer_key, layer, dflt))
         else:
             # XYZ / arcgisrest / etc. can be handled later
             continue
@@ -520,10 +831,13 @@ def build_layer_json_document(model: Dict[str, Any]) -> Dict[str, Any]:
     #print("DEBUG build_layer_json_document switchLayers keys:", list(model.get("switchLayers", {}).keys()))
     #print("DEBUG build_layer_json_document layer keys sample:", list(model.get("layers", {}).keys())[:10])
 
+    child_entries: Dict[str, Dict[str, Any]] = {}
     for switch_key, sw in model.get("switchLayers", {}).items():
         kids = sw.get("childrenLayerKeys") or []
         #print("DEBUG switch", switch_key, "kids:", len(kids), "example:", kids[:3])
-        layers_out.append(_build_switch_layer_entry(switch_key, sw, defaults, layers_by_key))
+        layers_out.append(
+            _build_switch_layer_entry(switch_key, sw, dflt, layers_by_key, child_entries)
+        )
 
     # 3) Inject canonical XYZ layers for all portals
     _inject_xyz_layers(layers_out)
@@ -533,8 +847,115 @@ def build_layer_json_document(model: Dict[str, Any]) -> Dict[str, Any]:
         "layers": layers_out,
     }
 
+def _switch_child_keys(switch_map: Dict[str, Dict[str, Any]]) -> frozenset:
+    """
+    LayerKeys that appear as a child of any switchlayer in switch_map.
+    """
+    return frozenset(
+        child_key
+        for sw in switch_map.values()
+        for child_key in (sw.get("childrenLayerKeys") or ())
+        if child_key
+    )
+
+def _iter_layer_entries(
+    conn: sqlite3.Connection,
+    portal_key: str,
+    portal_id: Optional[int],
+    defaults: Dict[str, Any],
+    shared=None,
+):
+    """
+    Yield the "layers" entries of a portal's layer JSON document in one pass
+    over the service layer rows, without building the canonical model.
+
+    Standalone WMS/WFS entries are yielded as each row is read; only the
+    layerInfo of switch children is kept, for the switchlayer entries.
+    XYZ layers come last. shared is passed to _load_portal_layer_data.
+    """
+    svc_rows, switch_map, fields_by_sl, styles_by_ms, orderby_by_ms = (
+        _load_portal_layer_data(conn, portal_key, portal_id, shared)
+    )
+
+    switched_children = _switch_child_keys(switch_map)
+    dflt = _precompute_default_slices(defaults)
+
+    emitted_keys: set = set()
+    children_by_key: Dict[str, Any] = {}
+    for row in svc_rows:
+        layer = _layer_info_from_row(row, fields_by_sl, styles_by_ms, orderby_by_ms)
+        layer_key = layer["layerKey"]
+
+        if layer_key in switched_children:
+            children_by_key[layer_key] = layer
+            continue
+
+        service_type = layer["serviceType"]
+        if service_type == "WMS":
+            entry = _build_wms_layer_entry(layer_key, layer, dflt)
+        elif service_type == "WFS":
+            entry = _build_wfs_layer_entry(layer_key, layer, dflt)
+        else:
+            continue
+        emitted_keys.add(entry.get("layerKey"))
+        yield entry
+
+    child_entries: Dict[str, Dict[str, Any]] = {}
+    for switch_key, sw in switch_map.items():
+        entry = _build_switch_layer_entry(
+            switch_key, sw, dflt, children_by_key, child_entries
+        )
+        emitted_keys.add(entry.get("layerKey"))
+        yield entry
+
+    yield from _iter_new_xyz_layers(emitted_keys)
+
+def build_layer_json_document_direct(
+    conn: sqlite3.Connection, portal_key: str, portal_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Same document as build_layer_json_document(build_portal_layer_model(...)),
+    built in one pass over the service layer rows.
+    """
+    defaults = _build_defaults_block(portal_key or "")
+    return {
+        "defaults": defaults,
+        "layers": list(_iter_layer_entries(conn, portal_key, portal_id, defaults)),
+    }
+
+# Placeholder for optional keys in the single-literal entry builders; filtered
+# out before returning. None can't be used since some keys are emitted as null.
+_OMIT = object()
+
+class _DefaultSlices(NamedTuple):
+    """
+    The defaults-block values the WMS/WFS entry builders compare against.
+    """
+    wms_projection: str
+    wms_opacity: Any
+    wfs_projection: str
+    wfs_opacity: Any
+    wfs_no_cluster: Any
+
+def _precompute_default_slices(defaults: Dict[str, Any]) -> _DefaultSlices:
+    """
+    Pull the per-service openLayers / noCluster defaults out of the defaults
+    block once per document, instead of once per layer entry.
+    """
+    wms_defaults = defaults.get("wms") or {}
+    wfs_defaults = defaults.get("wfs") or {}
+    wms_ol = wms_defaults.get("openLayers") if isinstance(wms_defaults.get("openLayers"), dict) else {}
+    wfs_ol = wfs_defaults.get("openLayers") if isinstance(wfs_defaults.get("openLayers"), dict) else {}
+    return _DefaultSlices(
+        wms_projection=(wms_ol.get("projection") or "").strip() or "EPSG:2157",
+        wms_opacity=wms_ol.get("opacity"),
+        wfs_projection=(wfs_ol.get("projection") or "").strip() or "EPSG:2157",
+        wfs_opacity=wfs_ol.get("opacity"),  # normally None for WFS in your defaults
+        wfs_no_cluster=wfs_defaults.get("noCluster"),
+    )
+
 def _build_wms_layer_entry(
-    layer_key: str, layer: Dict[str, Any], defaults: Dict[str, Any]
+    layer_key: str, layer: Dict[str, Any], dflt: _DefaultSlices
 ) -> Dict[str, Any]:
     """
     Map canonical WMS layer -> PMS-style WMS layer entry.
@@ -543,13 +964,6 @@ def _build_wms_layer_entry(
     """
     overrides = layer.get("overrides") or {}
 
-    entry: Dict[str, Any] = {
-        "layerType": "wms",
-        "layerKey": layer_key,
-    }
-    if overrides.get("hasGrid", True):
-        entry["gridXType"] = layer.get("gridXType")
-
     # serverOptions (always need layers)
     server_opts: Dict[str, Any] = {
         "layers": layer.get("mapLayerName"),
@@ -562,30 +976,14 @@ def _build_wms_layer_entry(
         )
 
     # Per-layer styles -> name/title + optional simple styles string
-    styles = []
-    for s in layer.get("styles") or []:
-        styles.append(
-            {
-                "name": s.get("name"),
-                "title": s.get("title"),
-            }
-        )
-    if styles:
-        entry["styles"] = styles
-
-    entry["serverOptions"] = server_opts
-
-    # labelClassName: emit for WMS only if this layer has labels
-    if overrides.get("hasLabels", True):
-        label_class = (overrides.get("labelClassName") or "").strip() or "labels"
-        entry["labelClassName"] = label_class
+    styles = [
+        {"name": s.get("name"), "title": s.get("title")}
+        for s in layer.get("styles") or ()
+    ]
 
     # openLayers: only emit if differs from defaults.wms.openLayers
-    wms_defaults = defaults.get("wms") or {}
-    wms_ol_defaults = (wms_defaults.get("openLayers") or {}) if isinstance(wms_defaults.get("openLayers"), dict) else {}
-
-    default_proj = (wms_ol_defaults.get("projection") or "").strip() or "EPSG:2157"
-    default_opacity = wms_ol_defaults.get("opacity")
+    default_proj = dflt.wms_projection
+    default_opacity = dflt.wms_opacity
 
     proj = (overrides.get("projection") or "").strip()
     opacity = overrides.get("opacity")
@@ -608,23 +1006,29 @@ def _build_wms_layer_entry(
             # If it's junk, better to omit than emit invalid JSON values
             pass
 
-    if ol:
-        entry["openLayers"] = ol
-
-    # Grouping (niche)
-    grouping = layer.get("grouping")
-    if grouping:
-        entry["grouping"] = grouping
-
-    ol = entry.get("openLayers")
-    if isinstance(ol, dict) and "maxScale" in ol:
+    if "maxScale" in ol:
         raise RuntimeError(f"maxScale injected inside builder for layer_key={layer_key}")
 
-
-    return entry
+    # Built in one literal, in output key order; _OMIT marks keys to drop.
+    entry = {
+        "layerType": "wms",
+        "layerKey": layer_key,
+        "gridXType": layer.get("gridXType") if overrides.get("hasGrid", True) else _OMIT,
+        "styles": styles or _OMIT,
+        "serverOptions": server_opts,
+        # labelClassName: emit for WMS only if this layer has labels
+        "labelClassName": (
+            (overrides.get("labelClassName") or "").strip() or "labels"
+            if overrides.get("hasLabels", True) else _OMIT
+        ),
+        "openLayers": ol or _OMIT,
+        # Grouping (niche)
+        "grouping": layer.get("grouping") or _OMIT,
+    }
+    return {k: v for k, v in entry.items() if v is not _OMIT}
 
 def _build_wfs_layer_entry(
-    layer_key: str, layer: Dict[str, Any], defaults: Dict[str, Any]
+    layer_key: str, layer: Dict[str, Any], dflt: _DefaultSlices
 ) -> Dict[str, Any]:
     """
     Map canonical WFS layer -> PMS-style WFS layer entry.
@@ -634,18 +1038,6 @@ def _build_wfs_layer_entry(
     overrides = layer.get("overrides") or {}
     fields = layer.get("fields") or {}
 
-    entry: Dict[str, Any] = {
-        "layerType": "wfs",
-        "layerKey": layer_key,
-    }
-    if overrides.get("hasGrid", True):
-        entry["gridXType"] = layer.get("gridXType")
-    entry.update({
-        "featureType": layer.get("mapLayerName"),
-        "geomFieldName": (layer.get("defaults") or {}).get("geomFieldName") or "msGeometry",
-        "idProperty": fields.get("idProperty"),
-    })
-
     # serverOptions.propertyname
     server_opts: Dict[str, Any] = {}
     property_names = list(fields.get("propertyNames") or [])
@@ -666,12 +1058,8 @@ def _build_wfs_layer_entry(
         )
         server_opts["ORDERBY"] = orderby_str
 
-    if server_opts:
-        entry["serverOptions"] = server_opts
-
     # noCluster: only emit if differs from defaults.wfs.noCluster
-    wfs_defaults = defaults.get("wfs") or {}
-    default_no_cluster = wfs_defaults.get("noCluster")
+    default_no_cluster = dflt.wfs_no_cluster
 
     override_no_cluster = overrides.get("noCluster")
     eff_no_cluster = None
@@ -680,56 +1068,34 @@ def _build_wfs_layer_entry(
     elif default_no_cluster is not None:
         eff_no_cluster = bool(default_no_cluster)
 
-    if eff_no_cluster is not None and (default_no_cluster is None or eff_no_cluster != bool(default_no_cluster)):
-        entry["noCluster"] = eff_no_cluster
+    if not (eff_no_cluster is not None and (default_no_cluster is None or eff_no_cluster != bool(default_no_cluster))):
+        eff_no_cluster = _OMIT
 
     # Styles — if UseLabelRule was set in DB model, we expect style dicts to carry a marker.
     # But you currently pass in s.get("labelRule") sometimes, so we enforce the correct value here.
     has_labels = overrides.get("hasLabels", True)
     label_class = (overrides.get("labelClassName") or "").strip() or "labels"
 
-    styles_out = []
-    for s in layer.get("styles") or []:
-        se = {
-            "name": s.get("name"),
-            "title": s.get("title"),
-        }
-
-        # If this style should emit labelRule (UseLabelRule=1), set it to the layer's label class.
-        # We treat presence of s["labelRule"] as the marker that UseLabelRule=1.
-        if has_labels and s.get("labelRule") is not None:
-            se["labelRule"] = label_class
-
-        styles_out.append(se)
-
-    if styles_out:
-        entry["styles"] = styles_out
+    # If this style should emit labelRule (UseLabelRule=1), set it to the layer's label class.
+    # We treat presence of s["labelRule"] as the marker that UseLabelRule=1.
+    styles_out = [
+        {"name": s.get("name"), "title": s.get("title"), "labelRule": label_class}
+        if has_labels and s.get("labelRule") is not None
+        else {"name": s.get("name"), "title": s.get("title")}
+        for s in layer.get("styles") or ()
+    ]
 
     # tooltipsConfig
-    tooltips = fields.get("tooltips") or []
-    if tooltips:
-        tcfg = []
-        for t in tooltips:
-            prop = t.get("field")
-            alias = t.get("alias")
-            if not prop:
-                continue
-            item = {"property": prop}
-            if alias and alias != prop:
-                item["alias"] = alias
-            tcfg.append(item)
-        if tcfg:
-            entry["tooltipsConfig"] = tcfg
-
-    # Grouping
-    grouping = layer.get("grouping")
-    if grouping:
-        entry["grouping"] = grouping
+    tcfg = [
+        {"property": prop, "alias": alias} if alias and alias != prop else {"property": prop}
+        for t in fields.get("tooltips") or ()
+        if (prop := t.get("field"))
+        for alias in (t.get("alias"),)
+    ]
 
     # openLayers: only emit if differs from defaults.wfs.openLayers
-    wfs_ol_defaults = (wfs_defaults.get("openLayers") or {}) if isinstance(wfs_defaults.get("openLayers"), dict) else {}
-    default_proj = (wfs_ol_defaults.get("projection") or "").strip() or "EPSG:2157"
-    default_opacity = wfs_ol_defaults.get("opacity")  # normally None for WFS in your defaults
+    default_proj = dflt.wfs_projection
+    default_opacity = dflt.wfs_opacity
 
     proj = (overrides.get("projection") or "").strip()
     opacity = overrides.get("opacity")
@@ -767,34 +1133,62 @@ def _build_wfs_layer_entry(
         except Exception:
             pass
 
-    if ol:
-        entry["openLayers"] = ol
-
-    return entry
+    # Built in one literal, in output key order; _OMIT marks keys to drop.
+    entry = {
+        "layerType": "wfs",
+        "layerKey": layer_key,
+        "gridXType": layer.get("gridXType") if overrides.get("hasGrid", True) else _OMIT,
+        "featureType": layer.get("mapLayerName"),
+        "geomFieldName": (layer.get("defaults") or {}).get("geomFieldName") or "msGeometry",
+        "idProperty": fields.get("idProperty"),
+        "serverOptions": server_opts or _OMIT,
+        "noCluster": eff_no_cluster,
+        "styles": styles_out or _OMIT,
+        "tooltipsConfig": tcfg or _OMIT,
+        "grouping": layer.get("grouping") or _OMIT,
+        "openLayers": ol or _OMIT,
+    }
+    return {k: v for k, v in entry.items() if v is not _OMIT}
 
 def _build_switch_layer_entry(
     switch_key: str,
     sw: Dict[str, Any],
-    defaults: Dict[str, Any],
+    dflt: _DefaultSlices,
     layers_by_key: Dict[str, Any],
+    child_entries: Optional[Dict[str, Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """
     Map canonical switch layer -> PMS-style switchlayer entry.
+
+    child_entries, if given, caches built child entries by layerKey across
+    calls, so a layer shared by several switches is built once and the same
+    (read-only) dict is emitted under each of them.
     """
+    if child_entries is None:
+        child_entries = {}
     #print("DEBUG _build_switch_layer_entry", switch_key, "kids:", sw.get("childrenLayerKeys"))
     # Build full child layer objects (WMS + WFS) under the switch wrapper
     children_out = []
     for child_key in (sw.get("childrenLayerKeys") or []):
         #print("DEBUG switch child lookup", child_key, "found:", child_key in layers_by_key)
+        built = child_entries.get(child_key)
+        if built is not None:
+            children_out.append(built)
+            continue
+
         child = layers_by_key.get(child_key)
         if not child:
             continue
 
-        st = (child.get("serviceType") or "").upper()
+        st = child["serviceType"]
         if st == "WMS":
-            children_out.append(_build_wms_layer_entry(child_key, child, defaults))
+            built = _build_wms_layer_entry(child_key, child, dflt)
         elif st == "WFS":
-            children_out.append(_build_wfs_layer_entry(child_key, child, defaults))
+            built = _build_wfs_layer_entry(child_key, child, dflt)
+        else:
+            continue
+        child_entries[child_key] = built
+        children_out.append(built)
 
     entry = {
         "layerType": "switchlayer",
@@ -805,47 +1199,183 @@ def _build_switch_layer_entry(
     # Default visibility / featureInfoWindow etc. are handled via defaults.switchlayer
     return entry
 
-def export_portal_layer_json(
-    conn: sqlite3.Connection,
-    portal_key: str,
-    output_path: str,
-) -> None:
+def _check_layer_entry(layer: Dict[str, Any]) -> None:
     """
-    High-level exporter: build canonical model from DB, then turn it into
-    a PMS-style layer JSON document ({ "defaults": ..., "layers": [...] })
-    and write it to disk.
+    Guardrail: openLayers.maxScale is allowed only on WFS layers, and must be int > 0
     """
-    import json
+    if not isinstance(layer, dict):
+        return
 
-    model = build_portal_layer_model(conn, portal_key)
-    doc = build_layer_json_document(model)
+    ol = layer.get("openLayers")
+    if not isinstance(ol, dict) or "maxScale" not in ol:
+        return
 
-    # Guardrail: openLayers.maxScale is allowed only on WFS layers, and must be int > 0
-    for layer in (doc.get("layers") or []):
-        if not isinstance(layer, dict):
-            continue
+    if (layer.get("layerType") or "").lower() != "wfs":
+        raise RuntimeError(
+            f"maxScale found on non-WFS layer '{layer.get('layerKey')}'"
+        )
 
-        ol = layer.get("openLayers")
-        if not isinstance(ol, dict) or "maxScale" not in ol:
-            continue
+    ms = ol.get("maxScale")
+    if not isinstance(ms, int) or ms <= 0:
+        raise RuntimeError(
+            f"Invalid maxScale '{ms}' on WFS layer '{layer.get('layerKey')}', expected int > 0"
+        )
+
+def _dumps_at(obj: Any, indent: int):
+    """
+    obj as indent=2 JSON with every line after the first shifted right by
+    `indent` spaces, so it can be spliced into an enclosing document.
+    Returns bytes with orjson, str with the stdlib fallback.
+    """
+    pad = "\n" + " " * indent
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).replace(b"\n", pad.encode())
+    return json.dumps(obj, ensure_ascii=False, indent=2).replace("\n", pad)
+
+def _encode_portal_layer_json(
+    conn: sqlite3.Connection, portal_key: str, portal_id: Optional[int], shared=None
+):
+    """
+    Build and serialize one portal's layer JSON document
+    ({ "defaults": ..., "layers": [...] }).
+
+    Each layer entry is checked and serialized as soon as it is built, so
+    the full document is never held as dicts. Output is identical to
+    json.dump(doc, indent=2, ensure_ascii=False) plus a trailing newline.
+    Returns bytes with orjson, str with the stdlib fallback.
+    """
+    defaults = _build_defaults_block(portal_key or "")
 
-        if (layer.get("layerType") or "").lower() != "wfs":
-            raise RuntimeError(
-                f"maxScale found on non-WFS layer '{layer.get('layerKey')}'"
-            )
+    chunks = []
+    for entry in _iter_layer_entries(conn, portal_key, portal_id, defaults, shared):
+        _check_layer_entry(entry)
+        chunks.append(_dumps_at(entry, 4))
+
+    # Literals must match _dumps_at's type: bytes with orjson, str otherwise.
+    lit = (lambda t: t.encode()) if orjson is not None else (lambda t: t)
+    if chunks:
+        layers_json = lit("[\n    ") + lit(",\n    ").join(chunks) + lit("\n  ]")
+    else:
+        layers_json = lit("[]")
+    return (
+        lit('{\n  "defaults": ') + _dumps_at(defaults, 2)
+        + lit(',\n  "layers": ') + layers_json
+        + lit("\n}\n")
+    )
 
-        ms = ol.get("maxScale")
-        if not isinstance(ms, int) or ms <= 0:
-            raise RuntimeError(
-                f"Invalid maxScale '{ms}' on WFS layer '{layer.get('layerKey')}', expected int > 0"
-            )
+def _write_json_file(output_path: str, body) -> None:
+    if isinstance(body, bytes):
+        with open(output_path, "wb") as f:
+            f.write(body)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(body)
+
+def export_portal_layer_json(
+    conn: sqlite3.Connection,
+    portal_key: str,
+    output_path: str,
+    portal_id: Optional[int] = None,
+) -> None:
+    """
+    High-level exporter: read the portal's layers from DB and write a
+    PMS-style layer JSON document ({ "defaults": ..., "layers": [...] })
+    to disk. Nothing is written unless every entry passes the guardrail.
+    """
+    _prepare_connection(conn)
+    with _read_transaction(conn):
+        body = _encode_portal_layer_json(conn, portal_key, portal_id)
 
     from app2.settings import tfs_checkout
     tfs_checkout(output_path)
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(doc, f, ensure_ascii=False, indent=2)
-        f.write("\n")
+    _write_json_file(output_path, body)
+
+def export_portals_batch(
+    conn: sqlite3.Connection,
+    portals,
+    out_dir: str,
+) -> List[str]:
+    """
+    Export <out_dir>/<PortalKey>.json for each (PortalId, PortalKey) in
+    portals, in one read transaction on the tuned connection (sharing its
+    statement cache) and checking out all target files in one TF call.
 
+    Fields, styles and ORDERBY are loaded once for all of them
+    (_load_shared_layer_data); each portal then only queries its own
+    layers and switch layers.
 
+    A failing portal doesn't stop the others; returns "PortalKey: error"
+    messages for the ones that failed.
+    """
+    _prepare_connection(conn)
+    targets = [
+        (portal_id, portal_key, os.path.join(out_dir, f"{portal_key}.json"))
+        for portal_id, portal_key in portals
+    ]
+
+    from app2.settings import tfs_checkout_batch
+    tfs_checkout_batch(path for _, _, path in targets)
+
+    errors: List[str] = []
+    with _read_transaction(conn):
+        shared = _load_shared_layer_data(conn) if len(targets) > 1 else None
+        for portal_id, portal_key, output_path in targets:
+            try:
+                body = _encode_portal_layer_json(conn, portal_key, portal_id, shared)
+                _write_json_file(output_path, body)
+            except Exception as e:
+                errors.append(f"{portal_key}: {e}")
+    return errors
+
+
+# Per-process read-only connection for export_portal_layer_jsons workers.
+_worker_conn: Optional[sqlite3.Connection] = None
+
+def _init_export_worker(db_uri: str) -> None:
+    global _worker_conn
+    _worker_conn = sqlite3.connect(db_uri, uri=True)
+    _prepare_connection(_worker_conn)
+
+def _export_one(target) -> Optional[str]:
+    portal_key, output_path = target
+    try:
+        with _read_transaction(_worker_conn):
+            body = _encode_portal_layer_json(_worker_conn, portal_key, None)
+        _write_json_file(output_path, body)
+    except Exception as e:
+        return f"{portal_key}: {e}"
+    return None
+
+def export_portal_layer_jsons(
+    db_path,
+    portal_keys,
+    out_dir: str,
+    workers: Optional[int] = None,
+) -> List[str]:
+    """
+    Export <out_dir>/<PortalKey>.json for each portal key in parallel, one
+    process per worker, each with its own read-only connection to db_path.
 
+    For scripted/bulk runs against a DB file on disk. The UI keeps using
+    export_portals_batch on its own connection, which also sees edits
+    not yet committed to the file.
 
+    Returns "PortalKey: error" messages for the portals that failed.
+    """
+    targets = [
+        (portal_key, os.path.join(out_dir, f"{portal_key}.json"))
+        for portal_key in portal_keys
+    ]
+    if not targets:
+        return []
+
+    from app2.settings import tfs_checkout_batch
+    tfs_checkout_batch(path for _, path in targets)
+
+    db_uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_export_worker,
+        initargs=(db_uri,),
+    ) as pool:
+        return [err for err in pool.map(_export_one, targets) if err]
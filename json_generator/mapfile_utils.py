@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 
 
 def parse_mapfile(map_path):
@@ -9,9 +10,6 @@ def parse_mapfile(map_path):
     - layers_by_name: dict name -> layer dict
     - error_message: None if ok, string if something went wrong
     """
-    if not os.path.exists(map_path):
-        return {}, f"File does not exist: {map_path}"
-
     try:
         import mappyfile
     except ImportError:
@@ -23,6 +21,8 @@ def parse_mapfile(map_path):
     try:
         with open(map_path, "r", encoding="utf-8") as f:
             ms_map = mappyfile.load(f)
+    except FileNotFoundError:
+        return {}, f"File does not exist: {map_path}"
     except Exception as exc:
         return {}, f"Failed to parse mapfile: {exc}"
 
@@ -39,6 +39,31 @@ def parse_mapfile(map_path):
 
     return layers_by_name, None
 
+@lru_cache(maxsize=8)
+def _parse_mapfile_cached(map_path, mtime_ns, size):
+    return parse_mapfile(map_path)
+
+def parse_mapfile_cached(map_path):
+    """
+    parse_mapfile(), reusing the last result for a file whose mtime and
+    size have not changed since it was parsed.
+
+    Only the top-level file is checked: edits to INCLUDEd files are not
+    noticed, so paths that must see on-disk changes call parse_mapfile.
+
+    Same return value as parse_mapfile. The layer dicts are shared between
+    calls, so treat them as read-only; the outer dict is a fresh copy.
+    """
+    try:
+        st = os.stat(map_path)
+    except OSError:
+        return parse_mapfile(map_path)
+
+    layers_by_name, error = _parse_mapfile_cached(
+        os.path.abspath(map_path), st.st_mtime_ns, st.st_size
+    )
+    return dict(layers_by_name), error
+
 def extract_styles(layer_dict):
     """
     GROUP-only style detection.